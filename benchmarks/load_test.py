@@ -0,0 +1,267 @@
+"""Load test of the evaluation API, fully offline.
+
+Starts, as subprocesses:
+- the fake RAG server (src/utils/fake_rag_api.py) serving generated responses, with artificial latency
+- the FastAPI app against a SQLite file (or any --db-url), with the real evaluator running on the
+  fake LLM backend (settings.llm = "fake:...", src/evaluator/fake_llm.py)
+
+then seeds a prompt with test cases and drives each scenario at every concurrency level,
+reporting p50/p95/p99 latency and throughput. Results are written to JSON so runs can be compared.
+
+Run with: python -m benchmarks.load_test [--concurrency 1 8 32] [--requests 200] [--output out.json]
+(needs the bench dependency group for SQLite: uv sync --group bench)
+"""
+from typing import Callable, Dict, List, Optional
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import httpx
+
+HOST = "127.0.0.1"
+# Settings the app cannot start without; they are never used with the fake backends
+DUMMY_ENV = {
+    "DB": "bench", "DB_HOST": "localhost", "DB_USER": "bench", "DB_PASSWORD": "bench",
+    "OPENROUTER_API_KEY": "bench", "OPENROUTER_URL": "http://127.0.0.1:9/v1",
+}
+
+
+# ---- server side: `python -m benchmarks.load_test serve ...` runs in the API subprocess ----
+
+def serve(port: int) -> None:
+    import logging
+    import uvicorn
+    from sqlalchemy import event
+    from src.db import database
+    from src.db.migrations import run_migrations
+    from src.main import app
+
+    if database.get_async_engine().dialect.name == "sqlite":
+        # Concurrent writers wait for the lock instead of failing with "database is locked"
+        @event.listens_for(database.get_async_engine().sync_engine, "connect")
+        def _sqlite_pragmas(dbapi_conn, _):
+            cursor = dbapi_conn.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA busy_timeout=30000")
+            cursor.close()
+
+    run_migrations(database.get_engine())
+    logging.getLogger("src.timing").setLevel(logging.WARNING)  # one log line per request would skew the results
+    uvicorn.run(app, host=HOST, port=port, log_level="warning")
+
+
+# ---- driver side ----
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    return statistics.quantiles(sorted_values, n=100, method="inclusive")[int(q) - 1]
+
+
+async def drive(client: httpx.AsyncClient, make_request: Callable, n_requests: int, concurrency: int) -> Dict:
+    """Send n_requests built by make_request(i), at most `concurrency` at a time, and summarize them."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+
+    async def one(i: int) -> None:
+        method, url, kwargs = make_request(i)
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            elapsed = (time.perf_counter() - start) * 1000
+        if status.startswith("2"):
+            latencies.append(elapsed)
+        else:
+            errors[status] = errors.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n_requests)))
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": n_requests,
+        "ok": len(latencies),
+        "errors": errors,
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 2),
+            "p95": round(percentile(latencies, 95), 2),
+            "p99": round(percentile(latencies, 99), 2),
+            "mean": round(statistics.fmean(latencies), 2) if latencies else 0.0,
+            "max": round(latencies[-1], 2) if latencies else 0.0,
+        },
+    }
+
+
+async def seed(client: httpx.AsyncClient, questions: List[str]) -> Dict:
+    prompt = (await client.post("/prompts/", json={
+        "prompt_name": "load test", "prompt_content": "Answer the question using only the context."
+    })).raise_for_status().json()
+    test_ids = (await client.post(f"/test_cases/{prompt['prompt_id']}/bulk", json=[
+        {"question": q, "answer": f"Answer to {q}"} for q in questions
+    ])).raise_for_status().json()["test_ids"]
+    return {"prompt_id": prompt["prompt_id"], "version_id": prompt["current_version_id"], "test_ids": test_ids}
+
+
+def scenarios(seeded: Dict, args) -> Dict[str, tuple]:
+    """name -> (request count, make_request(i) -> (method, url, kwargs))"""
+    prompt_id, version_id, test_ids = seeded["prompt_id"], seeded["version_id"], seeded["test_ids"]
+    page = {"params": {"limit": args.page_size}}
+    return {
+        "prompt_create": (args.requests, lambda i: ("POST", "/prompts/", {"json": {"prompt_name": f"p{i}", "prompt_content": "c"}})),
+        "prompt_list": (args.requests, lambda i: ("GET", "/prompts/", page)),
+        "prompt_get": (args.requests, lambda i: ("GET", f"/prompts/{prompt_id}", {})),
+        "test_case_list": (args.requests, lambda i: ("GET", f"/test_cases/{prompt_id}", page)),
+        "eval_single": (args.requests, lambda i: ("POST", f"/eval/version/{version_id}/test_case/{test_ids[i % len(test_ids)]}", {})),
+        "eval_batch": (args.batch_requests, lambda i: ("POST", f"/eval/version/{version_id}/run", {})),
+        "results_list": (args.requests, lambda i: ("GET", f"/results/{version_id}", page)),
+    }
+
+
+def start_process(argv: List[str], env: Dict[str, str]) -> subprocess.Popen:
+    # stdout carries the uvicorn access log; errors still go to stderr
+    return subprocess.Popen([sys.executable, *argv], env={**os.environ, **env}, stdout=subprocess.DEVNULL)
+
+
+async def wait_until_up(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"{url} did not come up within {timeout}s")
+                await asyncio.sleep(0.2)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args, workdir: str) -> Dict:
+    started = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    questions = [f"Load test question number {i}?" for i in range(args.test_cases)]
+    rag_file = os.path.join(workdir, "rag_responses.json")
+    with open(rag_file, "w") as f:
+        json.dump({"responses": [
+            {"question": q, "correct": f"Answer to {q}", "vague": "It depends.", "incorrect": "No idea.", "context": f"Context for {q}"}
+            for q in questions
+        ]}, f)
+
+    db_url = args.db_url or f"sqlite:///{os.path.join(workdir, 'bench.sqlite3')}"
+    env = {
+        **DUMMY_ENV,
+        "DATABASE_URL": db_url,
+        "RAG_API": f"http://{HOST}:{args.rag_port}/rag",
+        "RAG_MODE": "live",
+        "LLM_CACHE_ENABLED": "false",
+        "LLM_RATE_LIMIT_ENABLED": "false",
+        "EVAL_CONCURRENCY": str(args.eval_concurrency),
+        "EVALUATOR_ENGINE": args.engine,
+        "PRELOAD_AGENT": "true",  # keep the one-off agent construction out of the eval latencies
+        "LLM": f"fake:latency_ms={args.llm_latency_ms},latency_sigma={args.llm_latency_sigma},pass_rate={args.pass_rate},seed=0",
+        "FAKE_RAG_FILE": rag_file,
+    }
+    processes = [
+        start_process(["-m", "src.utils.fake_rag_api", "--port", str(args.rag_port),
+                       "--latency-ms", str(args.rag_latency_ms), "--jitter-ms", str(args.rag_jitter_ms), "--seed", "0"], env),
+        start_process(["-m", "benchmarks.load_test", "serve", "--port", str(args.api_port)], env),
+    ]
+    try:
+        await wait_until_up(f"http://{HOST}:{args.rag_port}/health")
+        await wait_until_up(f"http://{HOST}:{args.api_port}/metrics")
+
+        limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+        async with httpx.AsyncClient(base_url=f"http://{HOST}:{args.api_port}", limits=limits, timeout=300) as client:
+            seeded = await seed(client, questions)
+            results = []
+            for name, (n_requests, make_request) in scenarios(seeded, args).items():
+                if args.scenarios and name not in args.scenarios:
+                    continue
+                for concurrency in args.concurrency:
+                    summary = await drive(client, make_request, n_requests, concurrency)
+                    results.append({"scenario": name, **summary})
+                    lat = summary["latency_ms"]
+                    print(f"{name:<15} {concurrency:>5} {summary['throughput_rps']:>9.1f} "
+                          f"{lat['p50']:>9.1f} {lat['p95']:>9.1f} {lat['p99']:>9.1f} {sum(summary['errors'].values()):>7}")
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+
+    return {
+        "meta": {
+            "started": started,
+            "commit": git_commit(),
+            "database": db_url.split(":", 1)[0],
+            "config": {k: v for k, v in vars(args).items() if k not in ("command", "output")},
+        },
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command")
+    serve_parser = sub.add_parser("serve", help="(internal) run the API in the benchmark environment")
+    serve_parser.add_argument("--port", type=int, required=True)
+
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario and concurrency level")
+    parser.add_argument("--batch-requests", type=int, default=10, help="requests for the eval_batch scenario")
+    parser.add_argument("--test-cases", type=int, default=50, help="test cases seeded for the prompt")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--eval-concurrency", type=int, default=8, help="settings.eval_concurrency of the API")
+    parser.add_argument("--scenarios", nargs="+", help="only run these scenarios")
+    parser.add_argument("--db-url", help="database to test against (default: a fresh SQLite file)")
+    parser.add_argument("--rag-latency-ms", type=float, default=50.0)
+    parser.add_argument("--rag-jitter-ms", type=float, default=10.0)
+    parser.add_argument("--engine", choices=["agent", "pipeline"], default="agent", help="settings.evaluator_engine of the API")
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0, help="median latency of one fake LLM call")
+    parser.add_argument("--llm-latency-sigma", type=float, default=0.3, help="lognormal sigma of the fake LLM latency")
+    parser.add_argument("--pass-rate", type=float, default=0.5)
+    parser.add_argument("--api-port", type=int, default=8770)
+    parser.add_argument("--rag-port", type=int, default=8771)
+    parser.add_argument("--output", help="JSON results file (default: benchmarks/results/load_test-<timestamp>.json)")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args.port)
+        return
+
+    print(f"{'scenario':<15} {'conc':>5} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    with tempfile.TemporaryDirectory(prefix="load_test-") as workdir:
+        report = asyncio.run(run(args, workdir))
+
+    output = args.output or os.path.join(
+        os.path.dirname(__file__), "results", f"load_test-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Throughput of the RAG leg of /eval at increasing concurrency.
+
+Starts a stand-in RAG server that answers after a fixed delay and compares:
+- blocking: `requests.post` called inside the event loop (how /eval used to call RAG)
+- pooled:   the shared httpx.AsyncClient from src.services.rag_client
+
+Run with: python -m benchmarks.rag_client_bench [--latency 0.1] [--requests 200]
+"""
+from fastapi import FastAPI
+from src.config import get_settings
+from src.services.rag_client import create_rag_client, fetch_rag_answer
+import argparse
+import asyncio
+import requests
+import threading
+import time
+import uvicorn
+
+HOST, PORT = "127.0.0.1", 8765
+
+
+def start_stub_rag(latency: float) -> uvicorn.Server:
+    stub = FastAPI()
+
+    @stub.post("/rag")
+    async def rag(body: dict):
+        await asyncio.sleep(latency)
+        return {"answer": "stub answer", "context": "stub context"}
+
+    server = uvicorn.Server(uvicorn.Config(stub, host=HOST, port=PORT, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def run_blocking(n_requests: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            requests.post(get_settings().rag_api, json={"query": "q"})
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(n_requests)))
+    return n_requests / (time.perf_counter() - start)
+
+
+async def run_pooled(n_requests: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+    client = create_rag_client()
+
+    async def one():
+        async with semaphore:
+            await fetch_rag_answer(client, "q")
+
+    try:
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(n_requests)))
+        return n_requests / (time.perf_counter() - start)
+    finally:
+        await client.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.1, help="stand-in RAG latency in seconds")
+    parser.add_argument("--requests", type=int, default=200, help="requests per measurement")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    args = parser.parse_args()
+
+    get_settings().rag_api = f"http://{HOST}:{PORT}/rag"
+    server = start_stub_rag(args.latency)
+    try:
+        print(f"{'concurrency':>11} {'blocking req/s':>15} {'pooled req/s':>13}")
+        for concurrency in args.concurrency:
+            blocking = asyncio.run(run_blocking(args.requests, concurrency))
+            pooled = asyncio.run(run_pooled(args.requests, concurrency))
+            print(f"{concurrency:>11} {blocking:>15.1f} {pooled:>13.1f}")
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Import time of each kind of process, measured with `python -X importtime` in fresh interpreters.
+
+For every entry point it reports the median cumulative import time, the slowest modules
+below it, and whether heavy dependencies (LangChain, the OpenAI client, the database drivers)
+were loaded. API-only and frontend processes should not load LangChain at all; the agent entry
+shows what the first evaluation request (or settings.preload_agent) adds on top of the API.
+
+Run with: python -m benchmarks.startup_bench [--runs 5] [--top 10] [--output out.json]
+"""
+from benchmarks.load_test import DUMMY_ENV
+from typing import Dict, List
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ENTRY_POINTS = {
+    "api": "import src.main",
+    "worker": "import src.worker",
+    "frontend": "import src.frontend.utils.post_req",
+    "agent": "import src.main; from src.services.run_evaluation import get_agent; get_agent()",
+}
+HEAVY_PACKAGES = ("langchain", "langchain_core", "langchain_openai", "langgraph", "openai", "asyncpg", "psycopg2", "streamlit")
+LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$")
+
+
+def import_times(code: str) -> Dict:
+    """Run `code` in a fresh interpreter and parse its -X importtime report."""
+    env = {**os.environ, **DUMMY_ENV, "LLM": "fake", "PYTHONDONTWRITEBYTECODE": "1"}
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], env=env,
+                          capture_output=True, text=True, check=True)
+    modules = {}
+    total_us = 0
+    for line in proc.stderr.splitlines():
+        match = LINE.match(line)
+        if not match:
+            continue
+        cumulative_us, indent, name = int(match[2]), match[3], match[4]
+        modules[name] = cumulative_us
+        if not indent:  # top-level imports of the snippet
+            total_us += cumulative_us
+    return {"total_us": total_us, "modules": modules}
+
+
+def measure(code: str, runs: int, top: int) -> Dict:
+    samples = [import_times(code) for _ in range(runs)]
+    last = samples[-1]["modules"]
+    return {
+        "import_ms": {
+            "median": round(statistics.median(s["total_us"] for s in samples) / 1000, 1),
+            "min": round(min(s["total_us"] for s in samples) / 1000, 1),
+        },
+        "slowest": [{"module": name, "cumulative_ms": round(us / 1000, 1)}
+                    for name, us in sorted(last.items(), key=lambda item: item[1], reverse=True)[:top]],
+        "loaded": sorted(p for p in HEAVY_PACKAGES if p in last),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per entry point")
+    parser.add_argument("--top", type=int, default=10, help="slowest modules listed per entry point")
+    parser.add_argument("--entry-points", nargs="+", choices=list(ENTRY_POINTS), default=list(ENTRY_POINTS))
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results: List[Dict] = []
+    for name in args.entry_points:
+        result = {"entry_point": name, "code": ENTRY_POINTS[name], **measure(ENTRY_POINTS[name], args.runs, args.top)}
+        results.append(result)
+        print(f"\n{name}: {result['import_ms']['median']} ms median, {result['import_ms']['min']} ms min "
+              f"(loads: {', '.join(result['loaded']) or 'none of the heavy packages'})")
+        for entry in result["slowest"]:
+            print(f"  {entry['cumulative_ms']:>9.1f} ms  {entry['module']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,6 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict 
+from functools import lru_cache
+from typing import Literal, Optional
 
 class Settings(BaseSettings):
     db: str
@@ -6,11 +8,53 @@ class Settings(BaseSettings):
     db_user: str 
     db_port: str = "5432"
     db_password: str 
+    database_url: Optional[str] = None  # overrides the db_* settings, e.g. sqlite:///bench.sqlite3 for benchmarks
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_pre_ping: bool = True
+    db_pool_recycle: int = 1800       # seconds before a pooled connection is replaced
+    run_migrations_on_startup: bool = False  # apply pending schema migrations in the API lifespan
     api_url: str = "http://localhost:8000"  
     openrouter_api_key: str
     openrouter_url: str
-    llm: str = "gpt-4o-mini" 
+    llm: str = "gpt-4o-mini"          # OpenRouter model, or "fake[:latency_ms=..,pass_rate=..]" for the offline fake (src/evaluator/fake_llm.py)
+    preload_agent: bool = False       # build the evaluator agent in the API lifespan instead of on the first evaluation
+    evaluator_engine: Literal["agent", "pipeline"] = "agent"  # pipeline: score, then rewrite only on failure (no orchestrating LLM)
+    agent_debug: bool = False         # pretty print every agent step to the console
+    llm_cache_enabled: bool = True
+    llm_cache_path: str = "llm_cache.sqlite3"
+    llm_cache_ttl_seconds: int = 30 * 24 * 3600
+    llm_cache_max_entries: int = 100_000
+    llm_prompt_cost_per_1m: float = 0.15      # USD per million prompt tokens, for cost estimates
+    llm_completion_cost_per_1m: float = 0.60  # USD per million completion tokens
+    llm_rate_limit_enabled: bool = True
+    llm_rate_limit_path: str = "llm_rate_limit.sqlite3"  # limiter state shared by every process on this host
+    llm_requests_per_minute: int = 300
+    llm_tokens_per_minute: int = 500_000
+    llm_max_concurrency: int = 16     # upper bound for the adaptive (AIMD) concurrency limit
+    llm_min_concurrency: int = 1
+    llm_max_retries: int = 5          # retries of 429 / 5xx / connection errors
+    llm_retry_base_delay: float = 1.0 # seconds, doubled on each retry, with full jitter
+    llm_retry_max_delay: float = 60.0
     rag_api: str = "http://localhost:8001/rag"
+    rag_mode: Literal["live", "record", "replay", "refresh"] = "live"
+    rag_store_path: str = "rag_store.sqlite3"  # recorded responses for record/replay/refresh
+    rag_refresh_hours: float = 24.0            # refresh: re-fetch recorded responses older than this
+    rag_pool_size: int = 100          # max open connections to the RAG API
+    rag_pool_keepalive: int = 20      # idle connections kept alive for reuse
+    rag_connect_timeout: float = 5.0  # seconds
+    rag_read_timeout: float = 60.0    # seconds
+    bulk_insert_batch_size: int = 1000  # rows per multi-row INSERT in bulk imports
+    eval_concurrency: int = 8         # max test cases evaluated at once in a batch run
+    optimize_context_tokens: int = 8000  # estimated tokens of one consolidated rewrite call: prompt, failed cases and completion (aggregate optimization)
+    early_stop_confidence: float = 0.95  # confidence of the early-stopping rule of batch runs, over all its looks
+    early_stop_min_cases: int = 10    # test cases evaluated before a batch run may stop on the statistical rule
+    worker_concurrency: int = 8       # jobs claimed and evaluated at once by each worker process
+    worker_poll_interval: float = 2.0 # seconds a worker sleeps when the queue is empty
+    job_timeout_seconds: int = 900    # running jobs older than this are assumed lost and re-queued
+    job_max_attempts: int = 3
+    profile_sample_rate: float = 0.0  # fraction of API requests profiled with cProfile (0 = off)
+    profile_dir: str = "profiles"     # where sampled request profiles are written
 
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -19,7 +63,30 @@ class Settings(BaseSettings):
 
     @property
     def sql_alchemy_database_url(self) -> str:
+        if self.database_url:
+            return self.database_url
         return f"postgresql+psycopg2://{self.db_user}:{self.db_password}@{self.db_host}:{self.db_port}/{self.db}"
 
-settings = Settings()
+    @property
+    def async_sql_alchemy_database_url(self) -> str:
+        if self.database_url:
+            from sqlalchemy.engine import make_url  # not at module level: the frontend never needs SQLAlchemy
+
+            # Same database through the asyncio driver of its backend
+            url = make_url(self.database_url)
+            driver = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}[url.get_backend_name()]
+            return url.set(drivername=f"{url.get_backend_name()}+{driver}").render_as_string(hide_password=False)
+        return f"postgresql+asyncpg://{self.db_user}:{self.db_password}@{self.db_host}:{self.db_port}/{self.db}"
+
+@lru_cache
+def get_settings() -> Settings:
+    return Settings()
+
+
+def __getattr__(name: str):
+    # The code calls get_settings() where it needs a setting, so importing a module never builds Settings.
+    # `from src.config import settings` still works for scripts and notebooks, but builds it right away.
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
@@ -1,18 +1,63 @@
-from sqlalchemy import create_engine 
-from sqlalchemy.orm import sessionmaker 
-from src.config import settings
+from functools import lru_cache
+from sqlalchemy import Engine, create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, async_sessionmaker
+from src.config import get_settings
+from src.metrics import instrument_engine
 
+# Engines and session factories are created on first use, so importing this module
+# neither loads the database drivers nor needs the database settings.
+
+
+# Sync engine for migrations and scripts
 # postgresql+psycopg2://{db_user}:{db_password}@{db_host}:{port}/{db_name}
-SQLALCHEMY_DATABASE_URL = settings.sql_alchemy_database_url
+@lru_cache
+def get_engine() -> Engine:
+    engine = create_engine(get_settings().sql_alchemy_database_url)
+    instrument_engine(engine)
+    return engine
+
+
+@lru_cache
+def get_sessionmaker() -> sessionmaker:
+    return sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
+
+
+# Async engine used by the API routes and services
+@lru_cache
+def get_async_engine() -> AsyncEngine:
+    settings = get_settings()
+    async_engine = create_async_engine(
+        settings.async_sql_alchemy_database_url,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_pre_ping=settings.db_pool_pre_ping,
+        pool_recycle=settings.db_pool_recycle,
+    )
+    instrument_engine(async_engine.sync_engine)
+    return async_engine
+
+
+@lru_cache
+def get_async_sessionmaker() -> async_sessionmaker:
+    return async_sessionmaker(get_async_engine(), autoflush=False, expire_on_commit=False)
+
+
+async def get_db():
+    async with get_async_sessionmaker()() as db:  # always closes the session
+        yield db
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+_LAZY = {
+    "engine": get_engine,
+    "SessionLocal": get_sessionmaker,
+    "async_engine": get_async_engine,
+    "AsyncSessionLocal": get_async_sessionmaker,
+}
 
-def get_db():
-    db = SessionLocal()
-    try: 
-        yield db 
-    finally:
-        db.close()  # always close db 
 
+def __getattr__(name: str):
+    # Module-level names of the former eagerly created objects, for scripts and notebooks
+    if name in _LAZY:
+        return _LAZY[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,238 @@
+"""Versioned schema migrations.
+
+Every migration runs once, in order, and is recorded in the schema_migrations table.
+Migrations must be idempotent (checkfirst / IF NOT EXISTS) because the first one
+creates the tables from the current models on an empty database.
+
+    python -m src.db.migrations                # apply pending migrations
+    python -m src.db.migrations --status       # list applied / pending migrations
+    python -m src.db.migrations --check-plans  # confirm the list queries use the indexes
+"""
+from sqlalchemy import Column, DateTime, Engine, Integer, MetaData, String, Table, delete, func, insert, inspect, select, text, update
+from sqlalchemy.engine import Connection
+from src.db.models import Base, Prompt, PromptVersion, TestCase, TestResults, EvaluationRun, EvaluationJob, LLMCall, VersionResultStats
+from typing import Callable, List, Tuple
+import argparse
+import sys
+import uuid
+
+migration_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    migration_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String, nullable=False),
+    Column("applied", DateTime, nullable=False, server_default=func.now()),
+)
+
+# Arbitrary key for the Postgres advisory lock held while migrating, so that
+# several workers starting at once do not run the same migration twice
+MIGRATION_LOCK_ID = 7_240_311
+
+
+def _create_tables(*tables) -> Callable[[Connection], None]:
+    def upgrade(conn: Connection) -> None:
+        Base.metadata.create_all(conn, tables=[t.__table__ for t in tables], checkfirst=True)
+    return upgrade
+
+
+def _create_indexes(*names: str) -> Callable[[Connection], None]:
+    def upgrade(conn: Connection) -> None:
+        indexes = {index.name: index for table in Base.metadata.tables.values() for index in table.indexes}
+        for name in names:
+            indexes[name].create(conn, checkfirst=True)
+    return upgrade
+
+
+def _add_columns(model, *names: str) -> Callable[[Connection], None]:
+    def upgrade(conn: Connection) -> None:
+        # Checked by hand rather than with ADD COLUMN IF NOT EXISTS, which SQLite does not support
+        table = model.__table__
+        existing = {column["name"] for column in inspect(conn).get_columns(table.name)}
+        for name in names:
+            if name not in existing:
+                column = table.c[name]
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(conn.dialect)}"))
+    return upgrade
+
+
+def _create_version_result_stats(conn: Connection) -> None:
+    """Create version_result_stats and fill it from the results saved so far."""
+    _create_tables(VersionResultStats)(conn)
+    conn.execute(delete(VersionResultStats))
+    scored = TestResults.faithfulness.is_not(None)
+    conn.execute(insert(VersionResultStats).from_select(
+        ["version_id", "total", "passed", "failed", "scored",
+         "faithfulness_sum", "context_relevancy_sum", "answer_relevancy_sum", "updated"],
+        select(
+            TestResults.prompt_version_id,
+            func.count(),
+            func.count().filter(TestResults.result == "pass"),
+            func.count().filter(TestResults.result == "fail"),
+            func.count().filter(scored),
+            func.coalesce(func.sum(TestResults.faithfulness), 0.0),
+            func.coalesce(func.sum(TestResults.context_relevancy).filter(scored), 0.0),
+            func.coalesce(func.sum(TestResults.answer_relevancy).filter(scored), 0.0),
+            func.current_timestamp(),
+        ).group_by(TestResults.prompt_version_id),
+    ))
+
+
+def _llm_calls_per_version(conn: Connection) -> None:
+    """Let LLM calls belong to a prompt version without a test result (the consolidated rewrites of a run).
+    1. Add llm_calls.prompt_version_id and fill it from the test result of each call
+    2. Make llm_calls.result_id nullable
+    3. Index prompt_version_id for the per-version usage query"""
+    _add_columns(LLMCall, "prompt_version_id")(conn)
+    conn.execute(
+        update(LLMCall)
+        .where(LLMCall.prompt_version_id.is_(None))
+        .values(prompt_version_id=select(TestResults.prompt_version_id)
+                .where(TestResults.result_id == LLMCall.result_id)
+                .scalar_subquery())
+    )
+    table = LLMCall.__table__.name
+    columns = {column["name"]: column for column in inspect(conn).get_columns(table)}
+    if conn.dialect.name == "postgresql":
+        conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN result_id DROP NOT NULL"))
+        if not any(fk["constrained_columns"] == ["prompt_version_id"] for fk in inspect(conn).get_foreign_keys(table)):
+            conn.execute(text(f"ALTER TABLE {table} ADD FOREIGN KEY (prompt_version_id) REFERENCES prompt_versions (version_id)"))
+    elif not columns["result_id"]["nullable"]:
+        # SQLite cannot alter a column: rebuild the table from the model and copy the rows over
+        copied = ", ".join(columns)
+        for index in inspect(conn).get_indexes(table):
+            conn.execute(text(f"DROP INDEX {index['name']}"))
+        conn.execute(text(f"ALTER TABLE {table} RENAME TO {table}_old"))
+        LLMCall.__table__.create(conn)
+        conn.execute(text(f"INSERT INTO {table} ({copied}) SELECT {copied} FROM {table}_old"))
+        conn.execute(text(f"DROP TABLE {table}_old"))
+    _create_indexes("ix_llm_calls_prompt_version_id")(conn)
+
+
+def _add_prompt_created(conn: Connection) -> None:
+    """Add prompts.created, filled from the prompt's first version, and index it for the prompt list order."""
+    _add_columns(Prompt, "created")(conn)
+    conn.execute(
+        update(Prompt)
+        .where(Prompt.created.is_(None))
+        .values(created=func.coalesce(
+            select(func.min(PromptVersion.created)).where(PromptVersion.prompt_id == Prompt.prompt_id).scalar_subquery(),
+            func.current_timestamp(),
+        ))
+    )
+    _create_indexes("ix_prompts_created")(conn)
+
+
+# (version, description, upgrade)
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "initial schema", _create_tables(Prompt, PromptVersion, TestCase, TestResults)),
+    (2, "indexes on list route foreign keys", _create_indexes(
+        "ix_prompt_versions_prompt_id_version_number",
+        "ix_test_cases_prompt_id_created",
+        "ix_test_results_prompt_version_id_test_id",
+        "ix_test_results_test_id",
+    )),
+    (3, "evaluation run and job queue tables", _create_tables(EvaluationRun, EvaluationJob)),
+    (4, "per-call LLM usage table", _create_tables(LLMCall)),
+    (5, "judge score columns on test results", _add_columns(
+        TestResults, "faithfulness", "context_relevancy", "answer_relevancy",
+    )),
+    (6, "per-version result totals, backfilled from test_results", _create_version_result_stats),
+    (7, "llm_calls per prompt version, result_id nullable", _llm_calls_per_version),
+    (8, "prompts.created for the prompt list order", _add_prompt_created),
+]
+
+
+def applied_versions(conn: Connection) -> set:
+    schema_migrations.create(conn, checkfirst=True)
+    return set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+
+def run_migrations(engine: Engine) -> List[int]:
+    """Apply all pending migrations, each in its own transaction. Returns the versions applied."""
+    applied = []
+    with engine.connect() as conn:
+        if conn.dialect.name == "postgresql":
+            conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+            conn.commit()
+        try:
+            with conn.begin():
+                done = applied_versions(conn)
+            for version, description, upgrade in MIGRATIONS:
+                if version in done:
+                    continue
+                with conn.begin():
+                    upgrade(conn)
+                    conn.execute(schema_migrations.insert().values(version=version, description=description))
+                applied.append(version)
+        finally:
+            if conn.dialect.name == "postgresql":
+                conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+                conn.commit()
+    return applied
+
+
+# Representative list queries and the index each one must use
+PLAN_CHECKS = [
+    ("prompt versions by prompt", "ix_prompt_versions_prompt_id_version_number",
+     select(PromptVersion).where(PromptVersion.prompt_id == uuid.uuid4())
+     .order_by(PromptVersion.version_number, PromptVersion.version_id)),
+    ("test cases by prompt", "ix_test_cases_prompt_id_created",
+     select(TestCase).where(TestCase.prompt_id == uuid.uuid4())
+     .order_by(TestCase.created, TestCase.test_id)),
+    ("prompts by creation", "ix_prompts_created",
+     select(Prompt).order_by(Prompt.created, Prompt.prompt_id)),
+    ("test results by version", "ix_test_results_prompt_version_id_test_id",
+     select(TestResults).where(TestResults.prompt_version_id == uuid.uuid4())
+     .order_by(TestResults.test_id, TestResults.result_id)),
+    ("test results by test case", "ix_test_results_test_id",
+     select(TestResults).where(TestResults.test_id == uuid.uuid4())),
+]
+
+
+def check_query_plans(engine: Engine) -> bool:
+    """EXPLAIN each list query and report whether the plan uses the expected index.
+    Sequential scans are disabled for the check, so small tables still show whether an index is usable."""
+    ok = True
+    with engine.connect() as conn:
+        if conn.dialect.name != "postgresql":
+            print(f"Query plan check only supports postgresql, not {conn.dialect.name}")
+            return False
+        with conn.begin():
+            conn.execute(text("SET LOCAL enable_seqscan = off"))
+            for name, index, stmt in PLAN_CHECKS:
+                compiled = stmt.compile(conn, compile_kwargs={"literal_binds": True})
+                plan = "\n".join(conn.execute(text(f"EXPLAIN {compiled}")).scalars())
+                used = index in plan
+                ok = ok and used
+                print(f"[{'ok' if used else 'MISSING'}] {name}: {index}")
+                if not used:
+                    print(plan)
+    return ok
+
+
+def main() -> int:
+    from src.db.database import get_engine
+    engine = get_engine()
+
+    parser = argparse.ArgumentParser(description="Apply database schema migrations.")
+    parser.add_argument("--status", action="store_true", help="list applied and pending migrations")
+    parser.add_argument("--check-plans", action="store_true", help="check that the list queries use their indexes")
+    args = parser.parse_args()
+
+    if args.status:
+        with engine.begin() as conn:
+            done = applied_versions(conn)
+        for version, description, _ in MIGRATIONS:
+            print(f"{version:>4} {'applied' if version in done else 'pending':<8} {description}")
+        return 0
+    if args.check_plans:
+        return 0 if check_query_plans(engine) else 1
+
+    applied = run_migrations(engine)
+    print(f"Applied migrations: {applied}" if applied else "Database is up to date")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,14 @@
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column 
-from sqlalchemy import ForeignKey, String, UUID, DateTime, Index
+from sqlalchemy import ForeignKey, String, UUID, DateTime, Index, Integer, Float
 from typing import Optional 
 import datetime
 from uuid import uuid4
 
+def utcnow() -> datetime.datetime:
+    """Current UTC time as a naive datetime.
+    The timestamp columns are TIMESTAMP WITHOUT TIME ZONE holding UTC, and asyncpg rejects aware values for them."""
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
 class Base(DeclarativeBase):
     pass
 
@@ -13,6 +18,11 @@ class Prompt(Base):
     prompt_id: Mapped[UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid4)
     prompt_name: Mapped[str] = mapped_column(String, nullable=False)
     current_version_id: Mapped[UUID] = mapped_column(ForeignKey("prompt_versions.version_id"), nullable=True)
+    created: Mapped[datetime.datetime] = mapped_column(DateTime, default=utcnow)
+
+    __table_args__ = (
+        Index("ix_prompts_created", "created", "prompt_id"),
+    )
 
 class PromptVersion(Base):
     __tablename__ = "prompt_versions"
@@ -22,15 +32,17 @@ class PromptVersion(Base):
     version_number: Mapped[int] = mapped_column(default=1)
     prompt_content: Mapped[str] = mapped_column(String, nullable=False)
     status: Mapped[str] = mapped_column(String, default="inactive")
-    created: Mapped[datetime.datetime] = mapped_column(DateTime, default=lambda: datetime.datetime.now(datetime.timezone.utc))
+    created: Mapped[datetime.datetime] = mapped_column(DateTime, default=utcnow)
 
     __table_args__ = (
         Index(
             "uq_prompt_active_status",
             "prompt_id",
             unique=True,
-            postgresql_where=(status == "active")
+            postgresql_where=(status == "active"),
+            sqlite_where=(status == "active")
         ),
+        Index("ix_prompt_versions_prompt_id_version_number", "prompt_id", "version_number"),
     )
 
 class TestCase(Base):
@@ -40,7 +52,11 @@ class TestCase(Base):
     question: Mapped[str] = mapped_column(String, nullable=True)
     answer: Mapped[str] = mapped_column(String, nullable=True)
     prompt_id: Mapped[UUID] = mapped_column(ForeignKey("prompts.prompt_id"), nullable=False)
-    created: Mapped[datetime.datetime] = mapped_column(DateTime, default=lambda: datetime.datetime.now(datetime.timezone.utc))
+    created: Mapped[datetime.datetime] = mapped_column(DateTime, default=utcnow)
+
+    __table_args__ = (
+        Index("ix_test_cases_prompt_id_created", "prompt_id", "created", "test_id"),
+    )
 
 
 class TestResults(Base):
@@ -51,4 +67,83 @@ class TestResults(Base):
     prompt_version_id: Mapped[UUID] = mapped_column(ForeignKey("prompt_versions.version_id"), nullable=False)
     result: Mapped[str] = mapped_column(String, nullable=True)
     reason: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    # Judge scores of the evaluate_prompt step
+    faithfulness: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    context_relevancy: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    answer_relevancy: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+
+    __table_args__ = (
+        Index("ix_test_results_prompt_version_id_test_id", "prompt_version_id", "test_id"),
+        Index("ix_test_results_test_id", "test_id"),
+    )
+
+
+class EvaluationRun(Base):
+    __tablename__ = "evaluation_runs"
+
+    run_id: Mapped[UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid4)
+    prompt_version_id: Mapped[UUID] = mapped_column(ForeignKey("prompt_versions.version_id"), nullable=False)
+    status: Mapped[str] = mapped_column(String, default="queued")  # queued -> running -> completed
+    total: Mapped[int] = mapped_column(Integer, default=0)
+    completed: Mapped[int] = mapped_column(Integer, default=0)
+    passed: Mapped[int] = mapped_column(Integer, default=0)
+    failed: Mapped[int] = mapped_column(Integer, default=0)
+    errored: Mapped[int] = mapped_column(Integer, default=0)
+    created: Mapped[datetime.datetime] = mapped_column(DateTime, default=utcnow)
+    finished: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime, nullable=True)
+
+
+class EvaluationJob(Base):
+    __tablename__ = "evaluation_jobs"
+
+    job_id: Mapped[UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid4)
+    run_id: Mapped[UUID] = mapped_column(ForeignKey("evaluation_runs.run_id"), nullable=False)
+    test_id: Mapped[UUID] = mapped_column(ForeignKey("test_cases.test_id"), nullable=False)
+    status: Mapped[str] = mapped_column(String, default="queued")  # queued -> running -> done | error
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    claimed_by: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    claimed_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime, nullable=True)
+    result_id: Mapped[Optional[UUID]] = mapped_column(ForeignKey("test_results.result_id"), nullable=True)
+    error: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    created: Mapped[datetime.datetime] = mapped_column(DateTime, default=utcnow)
+
+    __table_args__ = (
+        Index("ix_evaluation_jobs_status_created", "status", "created"),
+        Index("ix_evaluation_jobs_run_id", "run_id"),
+    )
+
+
+class LLMCall(Base):
+    __tablename__ = "llm_calls"
+
+    call_id: Mapped[UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid4)
+    result_id: Mapped[Optional[UUID]] = mapped_column(ForeignKey("test_results.result_id"), nullable=True)  # None for calls made for a whole run (optimize_prompt)
+    prompt_version_id: Mapped[Optional[UUID]] = mapped_column(ForeignKey("prompt_versions.version_id"), nullable=True)  # the version being evaluated
+    kind: Mapped[str] = mapped_column(String, nullable=False)  # evaluate_prompt | update_prompt | optimize_prompt | agent
+    model: Mapped[str] = mapped_column(String, nullable=False)
+    prompt_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    completion_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    latency_ms: Mapped[float] = mapped_column(Float, default=0.0)
+    cost: Mapped[float] = mapped_column(Float, default=0.0)  # estimated, USD
+    created: Mapped[datetime.datetime] = mapped_column(DateTime, default=utcnow)
+
+    __table_args__ = (
+        Index("ix_llm_calls_result_id", "result_id"),
+        Index("ix_llm_calls_prompt_version_id", "prompt_version_id"),
+    )
+
+
+class VersionResultStats(Base):
+    """Running totals of the test results of a prompt version, updated in the transaction that saves them,
+    so listings can show pass rates without scanning test_results."""
+    __tablename__ = "version_result_stats"
 
+    version_id: Mapped[UUID] = mapped_column(ForeignKey("prompt_versions.version_id"), primary_key=True)
+    total: Mapped[int] = mapped_column(Integer, default=0)
+    passed: Mapped[int] = mapped_column(Integer, default=0)
+    failed: Mapped[int] = mapped_column(Integer, default=0)
+    scored: Mapped[int] = mapped_column(Integer, default=0)  # results with judge scores
+    faithfulness_sum: Mapped[float] = mapped_column(Float, default=0.0)
+    context_relevancy_sum: Mapped[float] = mapped_column(Float, default=0.0)
+    answer_relevancy_sum: Mapped[float] = mapped_column(Float, default=0.0)
+    updated: Mapped[datetime.datetime] = mapped_column(DateTime, default=utcnow)
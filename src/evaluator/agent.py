@@ -1,27 +1,136 @@
 from langchain.agents import create_agent
 from langchain_openai import ChatOpenAI 
-from src.config import settings 
-from src.schemas import EvaluationLLMOut, AgentResponse, EvaluateToolInput, UpdateToolInput, UpdateLLMOut
+from src.config import get_settings
+from src.schemas import EvaluationLLMOut, AgentResponse, EvaluateToolInput, UpdateToolInput, UpdateLLMOut, FailedCase
 from langchain.tools import tool
 from langchain.messages import HumanMessage
-from src.config import settings
+from src.evaluator.cache import LLMCache
+from src.evaluator.fake_llm import FakeChatModel, is_fake
+from src.evaluator.rate_limiter import RateLimiter, estimate_tokens
+from src.evaluator.middleware import RateLimitMiddleware, UsageMiddleware
+from src.evaluator.usage import record
+from src.metrics import LLM_CACHE_LOOKUPS
+from typing import List, Tuple
+import asyncio
+import re
+import time
+
+# A test case passes only if every score reaches its threshold
+FAITHFULNESS_THRES = 0.7
+CONTEXT_RELEVANCY_THRES = 0.7
+ANSWER_RELEVANCY_THRES = 0.7
+
+
+def passes_thresholds(scores: EvaluationLLMOut) -> bool:
+    return (scores.faithfulness >= FAITHFULNESS_THRES and
+            scores.context_relevancy >= CONTEXT_RELEVANCY_THRES and
+            scores.answer_relevancy >= ANSWER_RELEVANCY_THRES)
+
+MAX_COMPLETION_TOKENS = 500
+# Longest RAG / correct answer quoted for one failed case in a consolidated rewrite
+MAX_FAILURE_ANSWER_CHARS = 2000
+
+
+def format_failure(number: int, failure: FailedCase) -> str:
+    return f"""
+        Failed Case {number}:
+        - User Query: {failure.query}
+        - RAG Answer: {failure.rag_ans[:MAX_FAILURE_ANSWER_CHARS]}
+        - Correct Answer: {failure.correct_answer[:MAX_FAILURE_ANSWER_CHARS]}
+        - Scores: faithfulness {failure.faithfulness}, context relevancy {failure.context_relevancy}, answer relevancy {failure.answer_relevancy}
+        - Reason: {failure.reason}
+        """
+
+
+def optimizer_prompt(prompt_content: str, failures: List[FailedCase]) -> str:
+    failed_cases = "".join(format_failure(number, failure) for number, failure in enumerate(failures, 1))
+    return f"""You are an expert prompt engineer responsible for refining prompt instructions used in a Retrieval-Augmented Generation (RAG) system.
+        The Current Prompt failed on several test cases of an evaluation run. Write ONE updated prompt that fixes the
+        failures as a whole, instead of patching each test case separately.
+
+        You MUST return your response strictly in the UpdateLLMOut structured format.
+        DO NOT include any extra text, explanations, markdown, or commentary outside the structured output.
+
+        ### INPUTS
+
+        Current Prompt: {prompt_content}
+        Failed Test Cases: {len(failures)}
+        {failed_cases}
+
+        ### IMPORTANT: YOUR TASK
+        - Find the patterns shared by the failed test cases (e.g. ignoring the context, incomplete answers, wrong format).
+        - Update the prompt so that it addresses those patterns in general terms.
+        - Do NOT add rules specific to a single query or answer: the prompt must keep working on cases that already pass.
+        - Preserve the original intent of the Current Prompt unless it directly caused the failures.
+
+        ### IMPORTANT: PROMPT UPDATE RULES
+        - Output a COMPLETE, production-ready prompt.
+        - Do NOT reference: evaluation scores, "RAG answer", "correct answer", test cases, internal analysis or reasoning steps.
+
+        ### OUTPUT FORMAT: STRICTLY ADHERE TO THIS SCHEMA
+        {UpdateLLMOut}
+        """
+
+
+def worst_first(failures: List[FailedCase]) -> List[FailedCase]:
+    return sorted(failures, key=lambda f: min((s for s in (f.faithfulness, f.context_relevancy, f.answer_relevancy) if s is not None), default=1.0))
+
+
+def take_chunk(prompt_content: str, failures: List[FailedCase], budget_tokens: int) -> List[FailedCase]:
+    """The leading failures that fit one rewrite call of `prompt_content` within the token budget, estimated the
+    way the rate limiter does: the whole optimizer prompt and the completion (at least one failure)."""
+    used = estimate_tokens(optimizer_prompt(prompt_content, []), MAX_COMPLETION_TOKENS)
+    chunk: List[FailedCase] = []
+    for number, failure in enumerate(failures, 1):
+        used += estimate_tokens(format_failure(number, failure), 0)
+        if chunk and used > budget_tokens:
+            break
+        chunk.append(failure)
+    return chunk
+
+
+def build_chat_model(max_retries: int):
+    """Chat model for settings.llm: "fake[:options]" for the offline fake backend, any other value is an OpenRouter model."""
+    settings = get_settings()
+    if is_fake(settings.llm):
+        return FakeChatModel.from_spec(settings.llm)
+    return ChatOpenAI(
+        base_url=settings.openrouter_url,
+        api_key=settings.openrouter_api_key,
+        model=settings.llm,
+        temperature=0,
+        max_completion_tokens=MAX_COMPLETION_TOKENS,
+        max_retries=max_retries,
+    )
 
 class EvaluatorAgent:
     def __init__(self):
-        self.llm = ChatOpenAI(
-            base_url=settings.openrouter_url,
-            api_key=settings.openrouter_api_key,
-            model=settings.llm, 
-            temperature=0,
-            max_completion_tokens=500,
-        )
+        settings = get_settings()
+        # Shared limiter for every LLM call (tools and agent loop); it does the retrying, so the client must not
+        self.limiter = RateLimiter(
+            settings.llm_rate_limit_path,
+            requests_per_minute=settings.llm_requests_per_minute,
+            tokens_per_minute=settings.llm_tokens_per_minute,
+            max_concurrency=settings.llm_max_concurrency,
+            min_concurrency=settings.llm_min_concurrency,
+            max_retries=settings.llm_max_retries,
+            base_delay=settings.llm_retry_base_delay,
+            max_delay=settings.llm_retry_max_delay,
+        ) if settings.llm_rate_limit_enabled else None
+        self.llm = build_chat_model(max_retries=0 if self.limiter else 2)
+        # Cache for the evaluate/update LLM steps, so unchanged inputs are not paid for twice
+        self.cache = LLMCache(
+            settings.llm_cache_path,
+            ttl_seconds=settings.llm_cache_ttl_seconds,
+            max_entries=settings.llm_cache_max_entries,
+        ) if settings.llm_cache_enabled else None
         # Define tool inside the constructor (so it can access self.llm and there's no error with @tool decorator)
         @tool("evaluate_prompt", args_schema=EvaluateToolInput)
-        def evaluate_prompt(prompt_content: str, 
-                            query: str, 
-                            rag_ans: str, 
-                            correct_answer: str,
-                            context: str) -> str:
+        async def evaluate_prompt(prompt_content: str, 
+                                  query: str, 
+                                  rag_ans: str, 
+                                  correct_answer: str,
+                                  context: str) -> str:
                 """
                 Evaluates the quality of a RAG-generated answer against a user query, a gold (correct) answer, and the provided context.
 
@@ -55,70 +164,19 @@ class EvaluatorAgent:
                 }
                 """
 
-                evaluation_prompt = f"""
-                You are an expert RAG evaluation model.
-
-                Your task is to evaluate the quality of a Retrieval-Augmented Generation (RAG)
-                answer using three metrics: Faithfulness, Context Relevancy, and Answer Relevancy.
-
-                You are given the following inputs:
-
-                ---
-                Prompt Content: {prompt_content}
-                User Query: {query}
-                RAG Answer: {rag_ans}
-                Correct Answer (Gold Standard): {correct_answer}
-                Provided Context: {context}
-                ---
-
-                ### Evaluation Guidelines
-
-                You MUST output numeric scores between 0.0 and 1.0 for each metric.
-
-                #### 1. Faithfulness
-                Score how strictly the RAG Answer is grounded in the Provided Context.
-                - 1.0 → All claims are directly supported by the context.
-                - 0.5 → Some claims are implied but not clearly stated.
-                - 0.0 → Contains hallucinations or unsupported information.
-
-                Do NOT use outside knowledge.
-
-                #### 2. Context Relevancy
-                Score how useful and relevant the Provided Context is for answering the User Query.
-                - 1.0 → Context directly supports answering the query.
-                - 0.5 → Context is partially relevant or incomplete.
-                - 0.0 → Context is irrelevant.
-
-                Judge the context itself, not the answer.
-
-                #### 3. Answer Relevancy
-                Score how well the RAG Answer addresses the User Query compared to the Correct Answer.
-                - 1.0 → Fully answers the query correctly and clearly.
-                - 0.5 → Partially answers or misses key details.
-                - 0.0 → Incorrect or unrelated answer.
-
-                #### 4. Reason:
-                Provide a short and concise one line explanation for a particular low score.
-
-                ### Output Rules
-                - Return ONLY structured output matching the EvaluationLLMOut schema.
-                """
-                faithfulness_thres = 0.7
-                conext_relevancy_thres = 0.7
-                answer_relevancy_thres = 0.7 
-
-                # Get structured output for evaluation scores
-                evaluator = self.llm.with_structured_output(EvaluationLLMOut)
-                scores = evaluator.invoke(evaluation_prompt)
+                scores = await self.score_answer(prompt_content, query, rag_ans, correct_answer, context)
                 reason = scores.reason
                 
                 # Compare with thresholds to determine pass/fail
-                if (scores.faithfulness >= faithfulness_thres and
-                    scores.context_relevancy >= conext_relevancy_thres and
-                    scores.answer_relevancy >= answer_relevancy_thres):
+                if passes_thresholds(scores):
                     return {
                          "prompt_id": prompt_content,     # CONTEXT
                          "query:" : query,
+                         "faithfulness": scores.faithfulness,  # EVALUATION SCORES (saved with the result)
+                         "context_relevancy": scores.context_relevancy,
+                         "answer_relevancy": scores.answer_relevancy,
+                         "quality": "pass",
+                         "reason": reason
                     }
                 else:
                     return {
@@ -135,17 +193,17 @@ class EvaluatorAgent:
                     }
                 
         @tool("update_prompt", args_schema=UpdateToolInput)
-        def update_prompt(prompt_content: str, 
-                          query: str, 
-                          rag_ans: str, 
-                          correct_answer: str,
-                          context: str,
-                          faithfulness: float,
-                          context_relevancy: float,
-                          answer_relevancy: float,
-                          quality: str,
-                          reason: str,
-                          ) -> str:
+        async def update_prompt(prompt_content: str, 
+                                query: str, 
+                                rag_ans: str, 
+                                correct_answer: str,
+                                context: str,
+                                faithfulness: float,
+                                context_relevancy: float,
+                                answer_relevancy: float,
+                                quality: str,
+                                reason: str,
+                                ) -> str:
                 """
                 Updates the prompt content if the quality from evaluate_prompt is "fail".
 
@@ -166,60 +224,28 @@ class EvaluatorAgent:
                 {
                     "quality": quality ("pass" or "fail"),
                     "prompt_content": updated_prompt(if quality is "fail", else existing prompt)
-                    "reason": reason (one line explanation for a low score)
+                    "reason": reason (one line explanation for a low score),
+                    "faithfulness": faithfulness,
+                    "context_relevancy": context_relevancy,
+                    "answer_relevancy": answer_relevancy
                 }
                 """
+                scores = {"faithfulness": faithfulness, "context_relevancy": context_relevancy, "answer_relevancy": answer_relevancy}
                 if quality == "pass":
                      return {
                           "quality": "pass",
                           "prompt_content": prompt_content,
-                          "reason": reason
+                          "reason": reason,
+                          **scores
                      }
                 
-                updater_prompt = f"""You are an expert prompt engineer responsible for refining prompt instructions used in a Retrieval-Augmented Generation (RAG) system.
-                Your sole task is to update the prompt content based strictly on the provided inputs.
-
-                You MUST return your response strictly in the UpdateLLMOut structured format.
-                DO NOT include any extra text, explanations, markdown, or commentary outside the structured output.
-
-                ### INPUTS
-
-                Current Prompt: {prompt_content}
-                User Query: {query}
-                RAG Answer: {rag_ans}
-                Correct Answer: {correct_answer}
-                Retrieved Context: {context}
-
-                Evaluation Signals (for guidance only):
-                - Faithfulness Score: {faithfulness}
-                - Context Relevancy Score: {context_relevancy}
-                - Answer Relevancy Score: {answer_relevancy}
-                - Quality Result: {quality}
-                - Reason for assigning the scores: {reason}
-
-                ### IMPORTANT: YOUR TASK
-                - Update the prompt based on the given User Query, Retrieved Context, RAG Answer, Correct Answer.
-                - Look at the Evaluation Signals for guidance on what to improve in the Current Prompt.
-                - Preserve the original intent of the Current Prompt unless it directly caused the failure.
-
-                The updated prompt should be written as a standalone instruction for a generation model.
-
-                ### IMPORTANT: PROMPT UPDATE RULES
-                - Output a COMPLETE, production-ready prompt.
-                - Do NOT reference: evaluation scores, "RAG answer", "correct answer", internal analysis or reasoning steps.
-
-                ### OUTPUT FORMAT: STRICTLY ADHERE TO THIS SCHEMA
-                {UpdateLLMOut}
-
-                Any deviation from this format will be treated as an invalid response.
-                """ 
-
-                updater = self.llm.with_structured_output(UpdateLLMOut)
-                updated_prompt = updater.invoke(updater_prompt)
+                updated_prompt = await self.rewrite_prompt(prompt_content, query, rag_ans, correct_answer, context,
+                                                           faithfulness, context_relevancy, answer_relevancy, quality, reason)
                 return {
                      "quality": "fail",
                      "prompt_content": updated_prompt.updated_prompt,
-                     "reason": reason
+                     "reason": reason,
+                     **scores
                 }
         self.tools = [evaluate_prompt, update_prompt]
 
@@ -249,7 +275,10 @@ class EvaluatorAgent:
         {
             "quality": ,
             "prompt_content": ,
-            "reason": ""
+            "reason": "",
+            "faithfulness": ,
+            "context_relevancy": ,
+            "answer_relevancy":
         }
         - Do not alter the tool's output before providing the final response.
 
@@ -260,11 +289,208 @@ class EvaluatorAgent:
             model=self.llm,
             tools=self.tools,
             system_prompt=self.prompt,
-            response_format=AgentResponse
+            response_format=AgentResponse,
+            # Limiter outermost, so the recorded latency does not include time spent waiting for it
+            middleware=([RateLimitMiddleware(self.limiter, MAX_COMPLETION_TOKENS)] if self.limiter else []) + [UsageMiddleware(self.llm.model_name)],
+        )
+
+    # LLM step used by the evaluate_prompt tool and the pipeline engine
+    async def score_answer(self, prompt_content: str, query: str, rag_ans: str, correct_answer: str, context: str) -> EvaluationLLMOut:
+        evaluation_prompt = f"""
+        You are an expert RAG evaluation model.
+
+        Your task is to evaluate the quality of a Retrieval-Augmented Generation (RAG)
+        answer using three metrics: Faithfulness, Context Relevancy, and Answer Relevancy.
+
+        You are given the following inputs:
+
+        ---
+        Prompt Content: {prompt_content}
+        User Query: {query}
+        RAG Answer: {rag_ans}
+        Correct Answer (Gold Standard): {correct_answer}
+        Provided Context: {context}
+        ---
+
+        ### Evaluation Guidelines
+
+        You MUST output numeric scores between 0.0 and 1.0 for each metric.
+
+        #### 1. Faithfulness
+        Score how strictly the RAG Answer is grounded in the Provided Context.
+        - 1.0 → All claims are directly supported by the context.
+        - 0.5 → Some claims are implied but not clearly stated.
+        - 0.0 → Contains hallucinations or unsupported information.
+
+        Do NOT use outside knowledge.
+
+        #### 2. Context Relevancy
+        Score how useful and relevant the Provided Context is for answering the User Query.
+        - 1.0 → Context directly supports answering the query.
+        - 0.5 → Context is partially relevant or incomplete.
+        - 0.0 → Context is irrelevant.
+
+        Judge the context itself, not the answer.
+
+        #### 3. Answer Relevancy
+        Score how well the RAG Answer addresses the User Query compared to the Correct Answer.
+        - 1.0 → Fully answers the query correctly and clearly.
+        - 0.5 → Partially answers or misses key details.
+        - 0.0 → Incorrect or unrelated answer.
+
+        #### 4. Reason:
+        Provide a short and concise one line explanation for a particular low score.
+
+        ### Output Rules
+        - Return ONLY structured output matching the EvaluationLLMOut schema.
+        """
+
+        # Get structured output for evaluation scores
+        evaluator = self.llm.with_structured_output(EvaluationLLMOut, include_raw=True)
+        return await self._cached_call(
+            "evaluate_prompt", EvaluationLLMOut, lambda: self._invoke("evaluate_prompt", evaluator, evaluation_prompt),
+            prompt_content=prompt_content, query=query, rag_ans=rag_ans,
+            correct_answer=correct_answer, context=context,
+        )
+
+    # LLM step used by the update_prompt tool and the pipeline engine
+    async def rewrite_prompt(self, prompt_content: str, query: str, rag_ans: str, correct_answer: str, context: str,
+                             faithfulness: float, context_relevancy: float, answer_relevancy: float,
+                             quality: str, reason: str) -> UpdateLLMOut:
+        updater_prompt = f"""You are an expert prompt engineer responsible for refining prompt instructions used in a Retrieval-Augmented Generation (RAG) system.
+        Your sole task is to update the prompt content based strictly on the provided inputs.
+
+        You MUST return your response strictly in the UpdateLLMOut structured format.
+        DO NOT include any extra text, explanations, markdown, or commentary outside the structured output.
+
+        ### INPUTS
+
+        Current Prompt: {prompt_content}
+        User Query: {query}
+        RAG Answer: {rag_ans}
+        Correct Answer: {correct_answer}
+        Retrieved Context: {context}
+
+        Evaluation Signals (for guidance only):
+        - Faithfulness Score: {faithfulness}
+        - Context Relevancy Score: {context_relevancy}
+        - Answer Relevancy Score: {answer_relevancy}
+        - Quality Result: {quality}
+        - Reason for assigning the scores: {reason}
+
+        ### IMPORTANT: YOUR TASK
+        - Update the prompt based on the given User Query, Retrieved Context, RAG Answer, Correct Answer.
+        - Look at the Evaluation Signals for guidance on what to improve in the Current Prompt.
+        - Preserve the original intent of the Current Prompt unless it directly caused the failure.
+
+        The updated prompt should be written as a standalone instruction for a generation model.
+
+        ### IMPORTANT: PROMPT UPDATE RULES
+        - Output a COMPLETE, production-ready prompt.
+        - Do NOT reference: evaluation scores, "RAG answer", "correct answer", internal analysis or reasoning steps.
+
+        ### OUTPUT FORMAT: STRICTLY ADHERE TO THIS SCHEMA
+        {UpdateLLMOut}
+
+        Any deviation from this format will be treated as an invalid response.
+        """
+
+        updater = self.llm.with_structured_output(UpdateLLMOut, include_raw=True)
+        return await self._cached_call(
+            "update_prompt", UpdateLLMOut, lambda: self._invoke("update_prompt", updater, updater_prompt),
+            prompt_content=prompt_content, query=query, rag_ans=rag_ans,
+            correct_answer=correct_answer, context=context,
+            faithfulness=faithfulness, context_relevancy=context_relevancy,
+            answer_relevancy=answer_relevancy, quality=quality, reason=reason,
         )
 
+    # LLM step of the aggregate optimization: one rewrite from many failed test cases
+    async def consolidate_prompt(self, prompt_content: str, failures: List[FailedCase]) -> UpdateLLMOut:
+        optimizer = self.llm.with_structured_output(UpdateLLMOut, include_raw=True)
+        return await self._cached_call(
+            "optimize_prompt", UpdateLLMOut,
+            lambda: self._invoke("optimize_prompt", optimizer, optimizer_prompt(prompt_content, failures)),
+            prompt_content=prompt_content, failures=[failure.model_dump() for failure in failures],
+        )
+
+    async def aoptimize(self, prompt_content: str, failures: List[FailedCase]) -> Tuple[str, int]:
+        """Rewrite the prompt once from all the failed test cases of a run.
+        The failures go in, worst scores first, in as few calls as settings.optimize_context_tokens allows; with
+        several calls, each one refines the prompt produced by the previous one, so each chunk is sized against
+        that prompt. Returns the prompt and the number of calls."""
+        budget_tokens = get_settings().optimize_context_tokens
+        remaining = worst_first(failures)
+        calls = 0
+        while remaining:
+            chunk = take_chunk(prompt_content, remaining, budget_tokens)
+            prompt_content = (await self.consolidate_prompt(prompt_content, chunk)).updated_prompt
+            remaining = remaining[len(chunk):]
+            calls += 1
+        return prompt_content, calls
+
+    async def _invoke(self, kind: str, runnable, prompt: str):
+        """Invoke a tool's structured-output runnable (include_raw=True), through the rate limiter when it is enabled.
+        The usage of the raw response is recorded; the parsed output is returned."""
+        async def call() -> dict:
+            start = time.perf_counter()
+            output = await runnable.ainvoke(prompt)
+            record(kind, output["raw"], self.llm.model_name, (time.perf_counter() - start) * 1000)
+            return output
+
+        if self.limiter is None:
+            output = await call()
+        else:
+            output = await self.limiter.run(
+                call, estimate_tokens(prompt, MAX_COMPLETION_TOKENS),
+                tokens_used=lambda output: (getattr(output["raw"], "usage_metadata", None) or {}).get("total_tokens"),
+            )
+        if output["parsed"] is None:
+            raise output["parsing_error"] or ValueError(f"{kind}: the LLM response could not be parsed")
+        return output["parsed"]
+
+    async def _cached_call(self, kind: str, schema, call, **inputs):
+        """Return the cached output for these inputs, or make the LLM call and cache its parsed output."""
+        if self.cache is None:
+            return await call()
+        key = LLMCache.make_key(kind, self.llm.model_name, self.llm.temperature, **inputs)
+        cached = await self.cache.aget(key, schema)
+        LLM_CACHE_LOOKUPS.labels(kind, "miss" if cached is None else "hit").inc()
+        if cached is not None:
+            return cached
+        output = await call()
+        await self.cache.aput(key, kind, output)
+        return output
+
+    # Evaluate step only: the prompt is returned unchanged (used by the aggregate optimization)
+    async def ascore(self, prompt_content: str, query: str, rag_ans: str, correct_answer: str, context: str) -> AgentResponse:
+        scores = await self.score_answer(prompt_content, query, rag_ans, correct_answer, context)
+        return AgentResponse(
+            quality="pass" if passes_thresholds(scores) else "fail",
+            prompt_content=prompt_content,
+            reason=scores.reason,
+            faithfulness=scores.faithfulness,
+            context_relevancy=scores.context_relevancy,
+            answer_relevancy=scores.answer_relevancy,
+        )
+
+    # Fixed evaluate -> update flow without the orchestrating LLM
+    async def run_pipeline(self, prompt_content: str, query: str, rag_ans: str, correct_answer: str, context: str) -> AgentResponse:
+        response = await self.ascore(prompt_content, query, rag_ans, correct_answer, context)
+        if response.quality == "pass":
+            return response
+
+        # Rewrite the prompt only when the test case fails
+        updated_prompt = await self.rewrite_prompt(prompt_content, query, rag_ans, correct_answer, context,
+                                                   response.faithfulness, response.context_relevancy, response.answer_relevancy,
+                                                   "fail", response.reason)
+        return response.model_copy(update={"prompt_content": updated_prompt.updated_prompt})
+
     # Evaluation method 
-    def evaluate(self, prompt_content: str, query: str, rag_ans: str, correct_answer: str, context: str) -> str:
+    async def aevaluate(self, prompt_content: str, query: str, rag_ans: str, correct_answer: str, context: str) -> AgentResponse:
+        settings = get_settings()
+        if settings.evaluator_engine == "pipeline":
+            return await self.run_pipeline(prompt_content, query, rag_ans, correct_answer, context)
+
         human_message = HumanMessage(
             content=f"""Evaluate the prompt with the following details:
             Prompt Content: {prompt_content}
@@ -273,13 +499,25 @@ class EvaluatorAgent:
             Correct Answer: {correct_answer}
             Context: {context}"""
         )
-        for step in self.agent.stream({"messages": [human_message]},
-                                      stream_mode="values"):
-            step["messages"][-1].pretty_print()  # for debugging
-        final_response = step["messages"][-1].content  
-        return final_response
-      
-agent = EvaluatorAgent()
+        inputs = {"messages": [human_message]}
+        if settings.agent_debug:
+            async for state in self.agent.astream(inputs, stream_mode="values"):
+                state["messages"][-1].pretty_print()
+        else:
+            state = await self.agent.ainvoke(inputs)
+
+        if state.get("structured_response") is not None:
+            return state["structured_response"]
+
+        # Fall back to parsing the JSON in the final message
+        match = re.search(r'\{.*\}', state["messages"][-1].content, re.DOTALL)
+        if not match:
+            return None
+        return AgentResponse.model_validate_json(match.group(0))
+
+    def evaluate(self, prompt_content: str, query: str, rag_ans: str, correct_answer: str, context: str) -> AgentResponse:
+        """Blocking wrapper around aevaluate for scripts and notebooks."""
+        return asyncio.run(self.aevaluate(prompt_content, query, rag_ans, correct_answer, context))
 
 # # ------ TESTING AGENT -----
 # resp=agent.evaluate(prompt_content="Provide a good response to the query based on the context.",
@@ -0,0 +1,103 @@
+from pydantic import BaseModel
+from typing import Optional, Type, TypeVar
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+T = TypeVar("T", bound=BaseModel)
+
+
+class LLMCache:
+    """Content-addressed cache for parsed LLM outputs, stored in a local SQLite file.
+    Entries expire after `ttl_seconds`; once there are more than `max_entries`,
+    the least recently used entries are evicted (checked every EVICT_EVERY writes).
+    aget / aput / astats run the SQLite work in a worker thread, off the event loop: it can wait up to
+    the SQLite timeout while another process holds the file lock."""
+
+    EVICT_EVERY = 100
+
+    def __init__(self, path: str, ttl_seconds: int, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS llm_cache (
+                   key TEXT PRIMARY KEY,
+                   kind TEXT NOT NULL,
+                   value TEXT NOT NULL,
+                   created REAL NOT NULL,
+                   accessed REAL NOT NULL
+               )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_accessed ON llm_cache (accessed)")
+
+    @staticmethod
+    def make_key(kind: str, model: str, temperature: float, **inputs) -> str:
+        """Hash of the call kind, model settings and every input that goes into the LLM prompt."""
+        payload = json.dumps(
+            {"kind": kind, "model": model, "temperature": temperature, "inputs": inputs},
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str, schema: Type[T]) -> Optional[T]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row and now - row[1] <= self.ttl_seconds:
+                self._conn.execute("UPDATE llm_cache SET accessed = ? WHERE key = ?", (now, key))
+                self.hits += 1
+                return schema.model_validate_json(row[0])
+            if row:  # expired
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            self.misses += 1
+            return None
+
+    def put(self, key: str, kind: str, value: BaseModel) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, kind, value, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, kind, value.model_dump_json(), now, now),
+            )
+            self._writes += 1
+            if self._writes % self.EVICT_EVERY == 0:
+                self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        self._conn.execute("DELETE FROM llm_cache WHERE created < ?", (now - self.ttl_seconds,))
+        self._conn.execute(
+            """DELETE FROM llm_cache WHERE key IN (
+                   SELECT key FROM llm_cache ORDER BY accessed DESC LIMIT -1 OFFSET ?
+               )""",
+            (self.max_entries,),
+        )
+
+    async def aget(self, key: str, schema: Type[T]) -> Optional[T]:
+        return await asyncio.to_thread(self.get, key, schema)
+
+    async def aput(self, key: str, kind: str, value: BaseModel) -> None:
+        await asyncio.to_thread(self.put, key, kind, value)
+
+    async def astats(self) -> dict:
+        return await asyncio.to_thread(self.stats)
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+        }
@@ -0,0 +1,195 @@
+"""Deterministic offline chat model, selected with settings.llm = "fake" or "fake:<options>".
+
+    LLM="fake:latency_ms=800,latency_sigma=0.5,pass_rate=0.7,completion_tokens=150"
+
+Options (all optional):
+- latency_ms:        median latency of a call (default 0)
+- latency_sigma:     sigma of the lognormal latency around the median, 0 for a fixed latency (default 0)
+- pass_rate:         fraction of test cases scored above the thresholds (default 0.5)
+- prompt_tokens:     prompt tokens reported per call (default: about 4 characters per token)
+- completion_tokens: completion tokens reported per call (default 100)
+- seed:              seed of the latency draws and of the pass/fail decisions (default 0)
+
+It answers the structured-output calls of the evaluate/update steps with schema-valid
+EvaluationLLMOut / UpdateLLMOut payloads, and drives the agent loop through tool calls:
+evaluate_prompt, then update_prompt, then the AgentResponse structured response.
+Whether a test case passes depends only on the seed and the prompt, so reruns give the same results.
+"""
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import PrivateAttr
+from typing import Any, Dict, List, Optional
+import ast
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import time
+import uuid
+
+FAKE_PREFIX = "fake"
+
+# Scores reported for passing / failing test cases (the thresholds are 0.7)
+PASS_SCORES = {"faithfulness": 0.92, "context_relevancy": 0.88, "answer_relevancy": 0.9}
+FAIL_SCORES = {"faithfulness": 0.65, "context_relevancy": 0.8, "answer_relevancy": 0.35}
+
+HUMAN_FIELDS = re.compile(
+    r"Prompt Content:(?P<prompt_content>.*?)\n\s*Query:(?P<query>.*?)\n\s*RAG Answer:(?P<rag_ans>.*?)"
+    r"\n\s*Correct Answer:(?P<correct_answer>.*?)\n\s*Context:(?P<context>.*)",
+    re.DOTALL,
+)
+CURRENT_PROMPT = re.compile(r"Current Prompt:(.*?)\n\s*(?:User Query|Failed Test Cases):", re.DOTALL)
+
+
+def is_fake(llm: str) -> bool:
+    return llm == FAKE_PREFIX or llm.startswith(f"{FAKE_PREFIX}:")
+
+
+class FakeChatModel(BaseChatModel):
+    """Offline stand-in for ChatOpenAI; see the module docstring for the options."""
+
+    model_name: str = FAKE_PREFIX
+    temperature: float = 0.0
+    latency_ms: float = 0.0
+    latency_sigma: float = 0.0
+    pass_rate: float = 0.5
+    prompt_tokens: Optional[int] = None
+    completion_tokens: int = 100
+    seed: int = 0
+
+    _rng: random.Random = PrivateAttr()
+
+    def model_post_init(self, __context: Any) -> None:
+        self._rng = random.Random(self.seed)
+
+    @classmethod
+    def from_spec(cls, spec: str) -> "FakeChatModel":
+        """Build from "fake" or "fake:key=value,key=value"."""
+        options: Dict[str, str] = {}
+        _, _, params = spec.partition(":")
+        for item in filter(None, (p.strip() for p in params.split(","))):
+            key, sep, value = item.partition("=")
+            if not sep:
+                raise ValueError(f"Invalid fake LLM option {item!r}, expected key=value")
+            options[key.strip()] = value.strip()
+        return cls(model_name=spec, **options)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def bind_tools(self, tools, *, tool_choice: Optional[Any] = None, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], tool_choice=tool_choice, **kwargs)
+
+    # ---- generation ----
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs) -> ChatResult:
+        time.sleep(self._latency())
+        return self._respond(messages, **kwargs)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self._latency())
+        return self._respond(messages, **kwargs)
+
+    def _latency(self) -> float:
+        if self.latency_ms <= 0:
+            return 0.0
+        return self.latency_ms * math.exp(self.latency_sigma * self._rng.gauss(0, 1)) / 1000
+
+    def _respond(self, messages: List[BaseMessage], tools: Optional[List[dict]] = None, **kwargs) -> ChatResult:
+        tool_names = [t["function"]["name"] for t in tools or []]
+        if len(tool_names) == 1:
+            # with_structured_output: a single forced tool carrying the schema
+            message = self._tool_call(tool_names[0], self._structured_args(tool_names[0], messages))
+        elif tool_names:
+            message = self._agent_step(messages, tool_names)
+        else:
+            message = AIMessage(content=json.dumps(self._structured_args("AgentResponse", messages)))
+
+        prompt_text = "".join(str(m.content) for m in messages)
+        prompt_tokens = self.prompt_tokens if self.prompt_tokens is not None else max(1, len(prompt_text) // 4)
+        message.usage_metadata = {
+            "input_tokens": prompt_tokens,
+            "output_tokens": self.completion_tokens,
+            "total_tokens": prompt_tokens + self.completion_tokens,
+        }
+        message.response_metadata = {"model_name": self.model_name, "finish_reason": "stop"}
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    @staticmethod
+    def _tool_call(name: str, args: dict) -> AIMessage:
+        return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": f"call_{uuid.uuid4().hex[:12]}", "type": "tool_call"}])
+
+    def _passes(self, text: str) -> bool:
+        digest = hashlib.sha256(f"{self.seed}:{text}".encode()).digest()
+        return int.from_bytes(digest[:8], "big") / 2 ** 64 < self.pass_rate
+
+    def _structured_args(self, schema_name: str, messages: List[BaseMessage]) -> dict:
+        text = str(messages[-1].content)
+        if schema_name == "EvaluationLLMOut":
+            passed = self._passes(text)
+            return {**(PASS_SCORES if passed else FAIL_SCORES),
+                    "reason": "All metrics meet the threshold." if passed else "The answer does not address the query."}
+        if schema_name == "UpdateLLMOut":
+            match = CURRENT_PROMPT.search(text)
+            current = match.group(1).strip() if match else ""
+            return {"updated_prompt": f"{current}\nAnswer the user query directly, using only the provided context."}
+        if schema_name == "AgentResponse":
+            fields = _human_fields(messages)
+            return {"quality": "pass", "prompt_content": fields.get("prompt_content", ""), "reason": "No tool results."}
+        raise ValueError(f"The fake LLM cannot produce a {schema_name}")
+
+    def _agent_step(self, messages: List[BaseMessage], tool_names: List[str]) -> AIMessage:
+        """Next step of the evaluate_prompt -> update_prompt -> AgentResponse loop."""
+        results = {m.name: _parse_tool_output(m.content) for m in messages if isinstance(m, ToolMessage)}
+        fields = _human_fields(messages)
+
+        if "evaluate_prompt" in tool_names and "evaluate_prompt" not in results:
+            return self._tool_call("evaluate_prompt", fields)
+
+        evaluation = results.get("evaluate_prompt", {})
+        if "update_prompt" in tool_names and "update_prompt" not in results:
+            failed = evaluation.get("quality") == "fail"
+            scores = {k: evaluation.get(k, v) for k, v in (FAIL_SCORES if failed else PASS_SCORES).items()}
+            return self._tool_call("update_prompt", {
+                **fields, **scores,
+                "quality": "fail" if failed else "pass",
+                "reason": evaluation.get("reason", "All metrics meet the threshold."),
+            })
+
+        update = results.get("update_prompt", {})
+        response = {
+            "quality": update.get("quality", "pass"),
+            "prompt_content": update.get("prompt_content", fields.get("prompt_content", "")),
+            "reason": update.get("reason", "All metrics meet the threshold."),
+            **{k: update[k] for k in PASS_SCORES if k in update},
+        }
+        if "AgentResponse" in tool_names:
+            return self._tool_call("AgentResponse", response)
+        return AIMessage(content=json.dumps(response))
+
+
+def _human_fields(messages: List[BaseMessage]) -> Dict[str, str]:
+    human = next((m for m in messages if isinstance(m, HumanMessage)), None)
+    match = HUMAN_FIELDS.search(str(human.content)) if human else None
+    return {k: v.strip() for k, v in match.groupdict().items()} if match else {}
+
+
+def _parse_tool_output(content: Any) -> dict:
+    if isinstance(content, dict):
+        return content
+    for parse in (json.loads, ast.literal_eval):
+        try:
+            value = parse(content)
+            if isinstance(value, dict):
+                return value
+        except (ValueError, SyntaxError, TypeError):
+            continue
+    return {}
@@ -0,0 +1,48 @@
+"""Agent middleware wrapping every model call of the agent loop (imported with the agent only)."""
+from langchain.agents.middleware import AgentMiddleware, ModelRequest, ModelResponse
+from langchain_core.messages import AIMessage
+from src.evaluator.rate_limiter import RateLimiter, estimate_tokens
+from src.evaluator.usage import record
+from typing import Awaitable, Callable, Optional
+import time
+
+
+def response_tokens(response: ModelResponse) -> Optional[int]:
+    """Total tokens reported by the provider for an agent model call."""
+    usage = [m.usage_metadata for m in response.result if getattr(m, "usage_metadata", None)]
+    return sum(u.get("total_tokens", 0) for u in usage) if usage else None
+
+
+class RateLimitMiddleware(AgentMiddleware):
+    """Runs every model call of the agent loop through the rate limiter."""
+
+    def __init__(self, limiter: RateLimiter, max_completion_tokens: int):
+        super().__init__()
+        self.limiter = limiter
+        self.max_completion_tokens = max_completion_tokens
+
+    async def awrap_model_call(self, request: ModelRequest, handler: Callable[[ModelRequest], Awaitable[ModelResponse]]) -> ModelResponse:
+        text = "".join(str(m.content) for m in request.messages)
+        if request.system_message is not None:
+            text += str(request.system_message.content)
+        return await self.limiter.run(
+            lambda: handler(request),
+            estimate_tokens(text, self.max_completion_tokens),
+            tokens_used=response_tokens,
+        )
+
+
+class UsageMiddleware(AgentMiddleware):
+    """Records tokens, latency and cost of every model call of the agent loop."""
+
+    def __init__(self, default_model: str):
+        super().__init__()
+        self.default_model = default_model
+
+    async def awrap_model_call(self, request: ModelRequest, handler: Callable[[ModelRequest], Awaitable[ModelResponse]]) -> ModelResponse:
+        start = time.perf_counter()
+        response = await handler(request)
+        latency_ms = (time.perf_counter() - start) * 1000
+        message = next((m for m in response.result if isinstance(m, AIMessage)), None)
+        record("agent", message, self.default_model, latency_ms)
+        return response
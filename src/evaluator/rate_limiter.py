@@ -0,0 +1,240 @@
+from typing import Any, Awaitable, Callable, List, Optional, Set
+import asyncio
+import math
+import random
+import sqlite3
+import threading
+import time
+import httpx
+import openai
+from src.metrics import LLM_RETRIES
+
+
+class RateLimiter:
+    """Token-bucket limiter for LLM calls with AIMD concurrency, shared by every process using the same SQLite file.
+
+    Two buckets refill continuously: one for requests (`requests_per_minute`) and one for
+    tokens (`tokens_per_minute`). A call waits until both buckets can pay for it and fewer than
+    the current concurrency limit of calls are in flight across all processes.
+    The concurrency limit grows by one per window of successful calls and halves when the
+    provider answers 429 or 5xx; those calls are retried with full-jitter exponential backoff.
+    The SQLite transactions run in worker threads, so waiting for another process' lock never blocks the event loop."""
+
+    DECREASE_COOLDOWN = 1.0  # seconds, so one burst of 429s halves the limit only once
+    LEASE_TTL = 300.0        # seconds before an in-flight call of a crashed process stops counting
+    SLOT_WAIT_MIN = 0.05     # seconds; a call waiting for a concurrency slot is woken by releases in this
+    SLOT_WAIT_MAX = 1.0      # process, and re-checks with backoff between these for the other processes
+
+    def __init__(self, path: str,
+                 requests_per_minute: int,
+                 tokens_per_minute: int,
+                 max_concurrency: int,
+                 min_concurrency: int = 1,
+                 max_retries: int = 5,
+                 base_delay: float = 1.0,
+                 max_delay: float = 60.0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = max(1, min(min_concurrency, max_concurrency))
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._slot_waiters: List[asyncio.Future] = []
+        self._abandoned: Set[asyncio.Task] = set()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # The limiter state is cheap to lose in a power failure, so skip the fsync of every commit
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS rate_limit (
+                   id INTEGER PRIMARY KEY CHECK (id = 1),
+                   requests REAL NOT NULL,
+                   tokens REAL NOT NULL,
+                   concurrency REAL NOT NULL,
+                   last_decrease REAL NOT NULL,
+                   updated REAL NOT NULL
+               )"""
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_limit_leases (lease_id INTEGER PRIMARY KEY AUTOINCREMENT, acquired REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "INSERT OR IGNORE INTO rate_limit (id, requests, tokens, concurrency, last_decrease, updated) VALUES (1, ?, ?, ?, 0, ?)",
+            (requests_per_minute, tokens_per_minute, max_concurrency, time.time()),
+        )
+
+    def _transaction(self, fn: Callable[[sqlite3.Connection, float], Any]) -> Any:
+        """Run fn(conn, now) in a write transaction; BEGIN IMMEDIATE locks the file against other processes."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self._conn, time.time())
+                self._conn.execute("COMMIT")
+                return result
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    async def _atransaction(self, fn: Callable[[sqlite3.Connection, float], Any]) -> Any:
+        """_transaction in a worker thread. It runs to completion even if the caller is cancelled meanwhile."""
+        return await asyncio.shield(asyncio.to_thread(self._transaction, fn))
+
+    def _try_acquire(self, conn: sqlite3.Connection, now: float, tokens: int):
+        """Take a request, `tokens` tokens and a concurrency slot.
+        Returns (lease_id, 0, False) or (None, seconds to wait, whether the wait is for a concurrency slot)."""
+        requests, bucket_tokens, concurrency, updated = conn.execute(
+            "SELECT requests, tokens, concurrency, updated FROM rate_limit WHERE id = 1"
+        ).fetchone()
+        elapsed = max(0.0, now - updated)
+        requests = min(self.requests_per_minute, requests + elapsed * self.requests_per_minute / 60)
+        bucket_tokens = min(self.tokens_per_minute, bucket_tokens + elapsed * self.tokens_per_minute / 60)
+
+        conn.execute("DELETE FROM rate_limit_leases WHERE acquired < ?", (now - self.LEASE_TTL,))
+        in_flight = conn.execute("SELECT COUNT(*) FROM rate_limit_leases").fetchone()[0]
+
+        wait = 0.0
+        if requests < 1:
+            wait = max(wait, (1 - requests) * 60 / self.requests_per_minute)
+        if bucket_tokens < tokens:
+            wait = max(wait, (tokens - bucket_tokens) * 60 / self.tokens_per_minute)
+        slot_full = in_flight >= math.floor(concurrency)
+
+        if wait or slot_full:
+            conn.execute("UPDATE rate_limit SET requests = ?, tokens = ?, updated = ? WHERE id = 1",
+                         (requests, bucket_tokens, now))
+            return None, wait, slot_full and not wait
+
+        conn.execute("UPDATE rate_limit SET requests = ?, tokens = ?, updated = ? WHERE id = 1",
+                     (requests - 1, bucket_tokens - tokens, now))
+        lease_id = conn.execute("INSERT INTO rate_limit_leases (acquired) VALUES (?)", (now,)).lastrowid
+        return lease_id, 0.0, False
+
+    def _release(self, conn: sqlite3.Connection, now: float, lease_id: int, token_correction: int, throttled: bool) -> None:
+        conn.execute("DELETE FROM rate_limit_leases WHERE lease_id = ?", (lease_id,))
+        concurrency, last_decrease = conn.execute(
+            "SELECT concurrency, last_decrease FROM rate_limit WHERE id = 1"
+        ).fetchone()
+        if throttled:
+            # Multiplicative decrease, at most once per cooldown
+            if now - last_decrease >= self.DECREASE_COOLDOWN:
+                concurrency, last_decrease = max(self.min_concurrency, concurrency / 2), now
+        else:
+            # Additive increase: about +1 after `concurrency` successful calls
+            concurrency = min(self.max_concurrency, concurrency + 1 / concurrency)
+        conn.execute(
+            "UPDATE rate_limit SET tokens = MIN(?, tokens + ?), concurrency = ?, last_decrease = ? WHERE id = 1",
+            (self.tokens_per_minute, token_correction, concurrency, last_decrease),
+        )
+
+    async def acquire(self, tokens: int) -> int:
+        tokens = min(tokens, self.tokens_per_minute)
+        slot_wait = self.SLOT_WAIT_MIN
+        while True:
+            attempt = asyncio.ensure_future(asyncio.to_thread(
+                self._transaction, lambda conn, now: self._try_acquire(conn, now, tokens)
+            ))
+            try:
+                lease_id, wait, for_slot = await asyncio.shield(attempt)
+            except asyncio.CancelledError:
+                # The transaction still finishes in its thread: give back the lease it may take
+                attempt.add_done_callback(self._release_abandoned)
+                raise
+            if lease_id is not None:
+                return lease_id
+            if not for_slot:
+                # The buckets refill at a known rate, so this is exactly how long to wait
+                await asyncio.sleep(wait)
+                slot_wait = self.SLOT_WAIT_MIN
+                continue
+            # Woken as soon as a call of this process releases its slot; slots released by other
+            # processes are noticed on the next check, with a backoff instead of a fixed busy-poll
+            waiter = asyncio.get_running_loop().create_future()
+            self._slot_waiters.append(waiter)
+            try:
+                await asyncio.wait_for(waiter, random.uniform(slot_wait / 2, slot_wait))
+            except asyncio.TimeoutError:
+                slot_wait = min(self.SLOT_WAIT_MAX, slot_wait * 2)
+            finally:
+                if waiter in self._slot_waiters:
+                    self._slot_waiters.remove(waiter)
+
+    def _release_abandoned(self, attempt: asyncio.Future) -> None:
+        if attempt.cancelled() or attempt.exception() is not None:
+            return
+        lease_id = attempt.result()[0]
+        if lease_id is not None:
+            task = asyncio.ensure_future(self.release(lease_id))
+            self._abandoned.add(task)  # referenced until done, so it is not garbage collected
+            task.add_done_callback(self._abandoned.discard)
+
+    async def release(self, lease_id: int, token_correction: int = 0, throttled: bool = False) -> None:
+        """Free the concurrency slot. `token_correction` refunds (or charges) the difference between
+        the estimated and the actual token usage."""
+        await self._atransaction(lambda conn, now: self._release(conn, now, lease_id, token_correction, throttled))
+        # Wake the calls of this process waiting for a slot (they re-check the shared state)
+        waiters, self._slot_waiters = self._slot_waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.get_loop().call_soon_threadsafe(_resolve, waiter)
+
+    async def run(self, call: Callable[[], Awaitable[Any]],
+                  estimated_tokens: int,
+                  tokens_used: Optional[Callable[[Any], Optional[int]]] = None) -> Any:
+        """Make the call under the limiter, retrying 429/5xx/connection errors with jittered backoff.
+        `tokens_used(result)` gives the actual usage, if known, to correct the token bucket."""
+        estimated_tokens = min(estimated_tokens, self.tokens_per_minute)
+        for attempt in range(self.max_retries + 1):
+            lease_id = await self.acquire(estimated_tokens)
+            try:
+                result = await call()
+            except BaseException as e:  # includes cancellation, which must free the slot too
+                retryable = isinstance(e, Exception) and is_retryable(e)
+                await self.release(lease_id, throttled=retryable)
+                if not retryable or attempt == self.max_retries:
+                    raise
+                LLM_RETRIES.inc()
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                await asyncio.sleep(max(delay, retry_after(e) or 0.0))
+                continue
+
+            actual = tokens_used(result) if tokens_used else None
+            await self.release(lease_id, token_correction=estimated_tokens - actual if actual is not None else 0)
+            return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            requests, tokens, concurrency = self._conn.execute(
+                "SELECT requests, tokens, concurrency FROM rate_limit WHERE id = 1"
+            ).fetchone()
+            in_flight = self._conn.execute("SELECT COUNT(*) FROM rate_limit_leases").fetchone()[0]
+        return {"requests": requests, "tokens": tokens, "concurrency": concurrency, "in_flight": in_flight}
+
+
+def _resolve(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+def is_retryable(error: Exception) -> bool:
+    """Rate limited, server errors and dropped connections are worth retrying; anything else is not."""
+    if isinstance(error, (openai.APIConnectionError, httpx.TransportError)):
+        return True
+    status_code = getattr(error, "status_code", None)
+    return status_code == 429 or (status_code is not None and status_code >= 500)
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Seconds from the Retry-After header of the provider response, if it sent one."""
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def estimate_tokens(text: str, max_completion_tokens: int) -> int:
+    """Rough upper bound for a call: ~4 characters per prompt token plus the completion budget."""
+    return len(text) // 4 + max_completion_tokens
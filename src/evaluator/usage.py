@@ -0,0 +1,57 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from src.config import get_settings
+from src.schemas import LLMCallIn
+from src.metrics import LLM_CALL_SECONDS, LLM_TOKENS
+from src import timing
+from typing import TYPE_CHECKING, Iterator, List, Optional
+
+if TYPE_CHECKING:
+    from langchain_core.messages import AIMessage
+
+# Request timing phase of each kind of LLM call
+TIMING_PHASES = {"evaluate_prompt": "llm_eval", "update_prompt": "llm_update", "optimize_prompt": "llm_optimize", "agent": "llm_agent"}
+
+# LLM calls made by the evaluation running in the current task; None when nobody is recording
+_calls: ContextVar[Optional[List[LLMCallIn]]] = ContextVar("llm_calls", default=None)
+
+
+@contextmanager
+def recording() -> Iterator[List[LLMCallIn]]:
+    """Collect every LLM call made inside the block (including in tasks it spawns)."""
+    calls: List[LLMCallIn] = []
+    token = _calls.set(calls)
+    try:
+        yield calls
+    finally:
+        _calls.reset(token)
+
+
+def estimate_cost(prompt_tokens: int, completion_tokens: int) -> float:
+    settings = get_settings()
+    return (prompt_tokens * settings.llm_prompt_cost_per_1m +
+            completion_tokens * settings.llm_completion_cost_per_1m) / 1_000_000
+
+
+def record(kind: str, message: Optional["AIMessage"], default_model: str, latency_ms: float) -> None:
+    """Record the usage reported on an LLM response message in the metrics and, if one is active, the recording."""
+    usage = (getattr(message, "usage_metadata", None) or {})
+    metadata = (getattr(message, "response_metadata", None) or {})
+    prompt_tokens = usage.get("input_tokens", 0)
+    completion_tokens = usage.get("output_tokens", 0)
+    LLM_CALL_SECONDS.labels(kind).observe(latency_ms / 1000)
+    LLM_TOKENS.labels(kind, "prompt").inc(prompt_tokens)
+    LLM_TOKENS.labels(kind, "completion").inc(completion_tokens)
+    timing.add(TIMING_PHASES.get(kind, kind), latency_ms)
+
+    calls = _calls.get()
+    if calls is None:
+        return
+    calls.append(LLMCallIn(
+        kind=kind,
+        model=metadata.get("model_name") or default_model,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        latency_ms=latency_ms,
+        cost=estimate_cost(prompt_tokens, completion_tokens),
+    ))
@@ -1,9 +1,9 @@
 import streamlit as st  
 from src.frontend.ui.add_prompt import add_new_prompt
 from src.frontend.ui.my_prompts import my_prompts
-from src.config import settings
+from src.config import get_settings
 
-API_URL = settings.api_url
+API_URL = get_settings().api_url
 
 st.set_page_config(page_title="Prompt Evaluator")
 
@@ -1,8 +1,8 @@
 import streamlit as st  
 import requests
-from src.config import settings
+from src.config import get_settings
 import json
-from src.utils.post_req import post_ques_ans, post_json, post_prompt
+from src.frontend.utils.post_req import post_ques_ans, post_json, post_prompt
 
 def add_new_prompt():
     # Use session state to toggle form visibility
@@ -49,7 +49,9 @@ def add_new_prompt():
                         if json_file is not None:
                             try:
                                 json_data = json.load(json_file).get("test_cases", [])
-                                post_json(json_data, prompt_id)
+                                bulk_response = post_json(json_data, prompt_id)
+                                if bulk_response is None or bulk_response.status_code != 201:
+                                    st.error("Failed to import test cases from the JSON file.")
                             except json.JSONDecodeError:
                                 st.error("Invalid JSON file format.") 
                         if question and answer:
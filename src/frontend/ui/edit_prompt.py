@@ -1,6 +1,6 @@
 import streamlit as st
 import requests
-from src.config import settings
+from src.config import get_settings
 
 # FORM IS RENDERED SEPARATELY
 def edit_prompt():
@@ -19,7 +19,7 @@ def edit_prompt():
             st.error("Prompt content cannot be empty.")
         else:
             update_response = requests.put(
-                f"{settings.api_url}/prompts/{selected['prompt_id']}",
+                f"{get_settings().api_url}/prompts/{selected['prompt_id']}",
                 json={"prompt_content": new_content},
             )
 
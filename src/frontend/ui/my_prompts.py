@@ -1,9 +1,8 @@
 import streamlit as st
-from src.config import settings 
-import requests
+from src.frontend.utils.get_req import get_all
 from src.frontend.ui.view_test_cases import test_case_dialog
 from src.frontend.ui.edit_prompt import edit_prompt
-# from src.frontend.ui.run_eval import run_evaluation
+from src.frontend.ui.run_eval import run_evaluation
 
 def my_prompts():
     if "selected_prompt" not in st.session_state:
@@ -12,13 +11,11 @@ def my_prompts():
     if "run_evaluation" not in st.session_state:
         st.session_state.run_evaluation = None
 
-    response = requests.get(f"{settings.api_url}/prompts/")
-    if response.status_code != 200:
+    prompts = get_all("/prompts/")
+    if prompts is None:
         st.error("Failed to fetch prompts")
         return
 
-    prompts = response.json()
-
     for prompt in prompts:
         with st.expander(f"{prompt['prompt_name']} (v: {prompt['version_number']})"):
             st.write(prompt['prompt_content'])
@@ -46,8 +43,8 @@ def my_prompts():
         edit_prompt()
 
     # run test cases func
-    # if st.session_state.run_evaluation:
-    #     run_evaluation()
+    if st.session_state.run_evaluation:
+        run_evaluation()
 
 
     
\ No newline at end of file
@@ -1,36 +1,38 @@
 import streamlit as st
 import requests
-from src.config import settings
 from src.frontend.ui.view_test_cases import test_case_dialog
+from src.frontend.utils.post_req import stream_evaluation
 
-# FORM IS RENDERED SEPARATELY
-def run_evaluatioin():
+# RESULTS ARE RENDERED AS EACH TEST CASE FINISHES
+def run_evaluation():
     selected = st.session_state.run_evaluation
-    
-    st.subheader(f"Evaluating: {selected['prompt_name']}")
 
-    st.subheader("Test Cases")
-    test_case_dialog(selected['prompt_id'])
+    st.subheader(f"Evaluating: {selected['prompt_name']} (v: {selected['version_number']})")
 
-    with st.form(key="Add test cases form"):
-        new_content = st.text_area(
-            "Prompt Content",
-            value=selected["prompt_content"]
-        )
-        submit = st.form_submit_button("Update Prompt")
+    with st.expander("Test Cases"):
+        test_case_dialog(selected['prompt_id'])
 
-    if submit:
-        if not new_content.strip():
-            st.error("Prompt content cannot be empty.")
-        else:
-            update_response = requests.put(
-                f"{settings.api_url}/prompts/{selected['prompt_id']}",
-                json={"prompt_content": new_content},
-            )
+    if not st.button("Start Evaluation", key=f"start_eval_{selected['current_version_id']}"):
+        return
 
-            if update_response.status_code == 200:
-                st.success("Prompt updated successfully.")
-                st.session_state.selected_prompt = None
-                st.rerun()
-            else:
-                st.error(update_response.text)
+    progress = st.empty()
+    results = st.container()
+    done = 0
+
+    try:
+        for event, data in stream_evaluation(selected['current_version_id']):
+            if event == "result":
+                done += 1
+                progress.info(f"Evaluated {done} test cases...")
+                with results.expander(f"{'✅' if data['result'] == 'pass' else '❌'} {data['test_id']}"):
+                    st.markdown(f"**Reason:** {data['reason']}")
+                    if data.get("new_prompt_content"):
+                        st.markdown("**Suggested prompt:**")
+                        st.write(data["new_prompt_content"])
+            elif event == "error":
+                done += 1
+                results.error(f"{data.get('test_id', 'Evaluation')}: {data['detail']}")
+            elif event == "summary":
+                progress.success(f"Passed {data['passed']} / {data['total']} (failed {data['failed']}, errors {data['errored']})")
+    except requests.exceptions.RequestException as e:
+        st.error(f"Error running evaluation: {e}")
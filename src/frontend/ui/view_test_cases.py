@@ -1,15 +1,13 @@
 import streamlit as st 
-import requests 
-from src.config import settings
+from src.frontend.utils.get_req import get_all
 
 # @st.dialog("View Test Cases") 
 def test_case_dialog(prompt_id):
     try: 
-        response = requests.get(f"{settings.api_url}/test_cases/{prompt_id}")
-        if response.status_code != 200:
+        test_cases = get_all(f"/test_cases/{prompt_id}")
+        if test_cases is None:
             st.error("Failed to fetch test cases")
             return
-        test_cases = response.json()
         for tc in test_cases:
             st.markdown(f"**Ques:** {tc['question']}")
             st.markdown(f"**Ans:** {tc['answer']}")
@@ -0,0 +1,21 @@
+from src.config import get_settings
+from typing import Optional
+import requests
+
+# Same as src.services.pagination, not imported so the frontend does not load the API's dependencies
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+PAGE_SIZE = 1000  # the API's largest page, for the fewest round trips
+
+def get_all(path: str) -> Optional[list]:
+    # Fetch every item of a paginated list endpoint, following the cursor of each page; None on error
+    items = []
+    params = {"limit": PAGE_SIZE}
+    while True:
+        response = requests.get(f"{get_settings().api_url}{path}", params=params)
+        if response.status_code != 200:
+            return None
+        items.extend(response.json())
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            return items
+        params = {"limit": PAGE_SIZE, "after": cursor}
@@ -1,5 +1,6 @@
-from src.config import settings
+from src.config import get_settings
 import requests
+import json
 
 def post_prompt(prompt_name, prompt_content):
     payload = {
@@ -7,7 +8,7 @@ def post_prompt(prompt_name, prompt_content):
         "prompt_content": prompt_content
     }
     try:
-        response = requests.post(f"{settings.api_url}/prompts/", json=payload)
+        response = requests.post(f"{get_settings().api_url}/prompts/", json=payload)
         return response
     except requests.exceptions.RequestException as e:
         return None 
@@ -19,17 +20,35 @@ def post_ques_ans(ques, answer, prompt_id):
         "prompt_id": prompt_id,
     }
     try:
-        response = requests.post(f"{settings.api_url}/test_cases/", json=payload)
+        response = requests.post(f"{get_settings().api_url}/test_cases/", json=payload)
         return response
     except requests.exceptions.RequestException as e:
         return None
 
 def post_json(json_data: list, prompt_id):
-    for item in json_data:
-        ques = item.get("question")
-        answer = item.get("answer")
-        if ques and answer:
-            post_ques_ans(ques, answer, prompt_id)
-    
+    # Send all test cases in one request to the bulk endpoint
+    payload = [
+        {"question": item.get("question"), "answer": item.get("answer")}
+        for item in json_data
+        if item.get("question") and item.get("answer")
+    ]
+    try:
+        response = requests.post(f"{get_settings().api_url}/test_cases/{prompt_id}/bulk", json=payload)
+        return response
+    except requests.exceptions.RequestException as e:
+        return None
 
+def stream_evaluation(prompt_version_id):
+    # Yield (event, data) pairs from the server-sent event stream of an evaluation run
+    with requests.post(f"{get_settings().api_url}/eval/version/{prompt_version_id}/run/stream", stream=True) as response:
+        if response.status_code != 200:
+            yield "error", {"detail": response.text}
+            return
+        event = None
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: ") and event:
+                yield event, json.loads(line[len("data: "):])
+                event = None
 
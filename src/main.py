@@ -1,11 +1,41 @@
 from fastapi import FastAPI
+from contextlib import asynccontextmanager
 from src.routes import prompt_versions, prompts, test_cases, evaluation, results
-from src.db.models import Base
-from src.db.database import engine
+from src.config import get_settings
+from src.db.database import get_engine
+from src.db.migrations import run_migrations
+from src.services.rag_client import create_rag_client
+from src.services.run_evaluation import get_agent
+from src.metrics import MetricsMiddleware, metrics_response, mark_process_dead
+from src.timing import TimingMiddleware
+import logging
 
-app = FastAPI() 
 
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    settings = get_settings()
+    # Schema changes are applied by `python -m src.db.migrations`, or here when enabled
+    if settings.run_migrations_on_startup:
+        run_migrations(get_engine())
+
+    # The evaluator (and LangChain with it) is otherwise only loaded by the first evaluation request
+    if settings.preload_agent:
+        get_agent()
+
+    # One pooled HTTP client for all RAG calls, closed on shutdown
+    app.state.rag_client = create_rag_client()
+    try:
+        yield
+    finally:
+        await app.state.rag_client.aclose()
+        mark_process_dead()
+
+logging.basicConfig(format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logging.getLogger("src").setLevel(logging.INFO)  # our request timing lines, without every library's INFO logs
+
+app = FastAPI(lifespan=lifespan) 
+app.add_middleware(TimingMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(prompts.router)
 app.include_router(test_cases.router)
@@ -14,3 +44,8 @@ app.include_router(evaluation.router)
 app.include_router(results.router)
 
 
+# GET - /metrics (Prometheus scrape endpoint)
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return metrics_response()
+
@@ -0,0 +1,121 @@
+"""Prometheus metrics for the API, the evaluator and the worker, served at /metrics.
+
+With several uvicorn workers, point PROMETHEUS_MULTIPROC_DIR at an empty directory shared by
+every process (API workers and `python -m src.worker`) before starting them:
+
+    rm -rf /tmp/prom && mkdir /tmp/prom
+    PROMETHEUS_MULTIPROC_DIR=/tmp/prom uvicorn src.main:app --workers 4
+
+/metrics then aggregates the samples of all processes, whichever worker serves the scrape.
+"""
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest, multiprocess
+from sqlalchemy import Engine, event
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from src import timing
+import os
+import time
+
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+# Evaluations take seconds to minutes, so the buckets go well past the client defaults
+SLOW_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Time to serve an API request, until the last byte of the response.",
+    ["method", "route", "status"], buckets=SLOW_BUCKETS,
+)
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds", "Time spent executing a database statement.",
+    ["operation"], buckets=DB_BUCKETS,
+)
+RAG_REQUEST_SECONDS = Histogram(
+    "rag_request_duration_seconds", "Latency of calls to the RAG API.", buckets=SLOW_BUCKETS,
+)
+RAG_ERRORS = Counter(
+    "rag_request_errors_total", "Failed calls to the RAG API.", ["reason"],
+)
+RAG_STORE_LOOKUPS = Counter(
+    "rag_store_lookups_total", "Lookups in the recorded RAG responses (record/replay/refresh modes).", ["outcome"],
+)
+LLM_CALL_SECONDS = Histogram(
+    "llm_call_duration_seconds", "Latency of LLM calls, by the step that made them.",
+    ["kind"], buckets=SLOW_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "llm_tokens_total", "Tokens reported by the LLM provider.", ["kind", "type"],
+)
+LLM_RETRIES = Counter(
+    "llm_retries_total", "LLM calls retried after a 429, 5xx or connection error.",
+)
+LLM_CACHE_LOOKUPS = Counter(
+    "llm_cache_lookups_total", "Lookups in the LLM output cache.", ["kind", "outcome"],
+)
+EVALUATIONS_IN_FLIGHT = Gauge(
+    "evaluations_in_flight", "Test case evaluations currently running.", multiprocess_mode="livesum",
+)
+
+
+class MetricsMiddleware:
+    """Records the latency of every HTTP request under its route template (not the raw path)."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_SECONDS.labels(scope["method"], route, str(status_code)).observe(time.perf_counter() - start)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Time every statement executed on the engine (pass `async_engine.sync_engine` for async engines)."""
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _stop(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        if operation not in ("SELECT", "INSERT", "UPDATE", "DELETE"):
+            operation = "OTHER"
+        DB_QUERY_SECONDS.labels(operation).observe(elapsed)
+        timing.add("db", elapsed * 1000)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        starts = context.connection.info.get("query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+
+def metrics_response() -> Response:
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+
+def mark_process_dead() -> None:
+    """Drop this process's live gauges from the multiprocess directory when it exits."""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
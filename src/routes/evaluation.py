@@ -1,25 +1,37 @@
-from fastapi import APIRouter, status, Depends, HTTPException
-from src.db.database import get_db
-from sqlalchemy.orm import Session
-from src.schemas import TestCaseIn, TestResultIn, EvaluationAPIOut, EditPromptIn
+from fastapi import APIRouter, status, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from src.db.database import get_db, get_async_sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.schemas import TestCaseIn, TestResultIn, EvaluationAPIOut, EditPromptIn, BatchEvaluationOut, LLMCacheStats, EvaluationRunOut, EvaluationStreamSummary, LLMUsageSummary, FailedCase, OptimizationOut, EvaluationError
 from src.db.models import Prompt, PromptVersion, TestCase, TestResults
-from src.config import settings
-from src.evaluator.agent import EvaluatorAgent, agent
-from src.services.update_prompt import update_prompt_version, set_prompt_active
-from src.services.add_test_case import add_result
+from src.config import get_settings
+from src.services.update_prompt import add_prompt_version, update_prompt_version, set_prompt_active
+from src.services.add_test_case import add_result, add_results
+from src.services.evaluation_runs import enqueue_run, get_run
+from src.services.llm_usage import add_llm_calls, run_usage
+from src.services.run_evaluation import MAX_CONCURRENCY, evaluate_test_case, evaluate_test_cases, iter_evaluations, get_agent
+from src.services.rag_client import get_rag_client
+from src.services.early_stopping import EarlyStopParams
+from src.evaluator.usage import recording
+from src.timing import phase
+from sqlalchemy import select
+from typing import TYPE_CHECKING, Literal, Optional
 from uuid import UUID
-import requests 
-import re
+import httpx
 import json
 
+if TYPE_CHECKING:
+    from src.evaluator.agent import EvaluatorAgent
+
 router = APIRouter(prefix="/eval", tags=["Evaluation"])
 
 # POST
 @router.post("/version/{prompt_version_id}/test_case/{t_id}", response_model=EvaluationAPIOut, status_code=status.HTTP_200_OK)
 async def make_evaluation(prompt_version_id: UUID,
                           t_id: UUID,
-                          db: Session = Depends(get_db),
-                          agent: EvaluatorAgent = Depends(lambda: agent)): 
+                          db: AsyncSession = Depends(get_db),
+                          agent: "EvaluatorAgent" = Depends(get_agent),
+                          rag_client: httpx.AsyncClient = Depends(get_rag_client)): 
     """Evaluate the prompt based on the retrieved answer and context from RAG and update the prompt content if necessary (quality: bad)
        1. Get the prompt content from the database
        2. Call RAG API with the provided query
@@ -28,74 +40,49 @@ async def make_evaluation(prompt_version_id: UUID,
        5. If the quality is "pass", set the prompt status to active"""
     
     # Get the the target version and it's prompt id from db
-    target_version = db.get(PromptVersion, prompt_version_id)  
+    target_version = await db.get(PromptVersion, prompt_version_id)  
     if not target_version:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Prompt version not found")
     
     prompt_content = target_version.prompt_content
 
-    prompt = db.get(Prompt, target_version.prompt_id) 
+    prompt = await db.get(Prompt, target_version.prompt_id) 
     if not prompt:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Prompt not found")
     
     # Get the test case details
-    test_case = db.get(TestCase, t_id)
+    test_case = await db.get(TestCase, t_id)
     if not test_case:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Test case not found")
 
-    # Call RAG API
-    rag_response = requests.post(f"{settings.rag_api}", json={"query": test_case.question})
-    
-    if rag_response.status_code != 200:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="RAG API error, check your api url and server status")
-    
-    rag_data = rag_response.json()
-
-    # Context for agent to evaluate prompt
-    rag_ans = rag_data.get("answer", "")
-    rag_context = rag_data.get("context", "")
-    correct_answer = test_case.answer
-
-    ### Agent Evaluation: Replace with OpenAI's prompt optimizer
-    # Pass prompt_content, query, rag_ans, correct_answer, context to agent
-    agent_result = agent.evaluate(
-        prompt_content=prompt_content,
-        query=test_case.question,
-        rag_ans=rag_ans,
-        correct_answer=correct_answer,
-        context=rag_context
-    )
+    # Call RAG API and let the agent evaluate the prompt against the test case
+    agent_json = await evaluate_test_case(prompt_content, test_case, agent, rag_client)
 
-    if not agent_result:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Evaluator Agent failed to provide a response.")
-        
-    # Parse the agent response to extract JSON
-    match = re.search(r'\{.*\}', agent_result)
-    if match:
-        json_str = match.group(0)  # still a string
-        agent_json = json.loads(json_str) # convert to dictionary
-
-
-    # FAIL CASE: Add the updated prompt to the databse with status active and set the current version in prompts table to the new version
-    if agent_json.get("quality") == "fail":
-       new_prompt_content = EditPromptIn(prompt_content=agent_json.get("prompt_content"))
-       # 1. Creates a new prompt version and updates the prompt_id to point to it
-       update_prompt_version(prompt, new_prompt_content, db)
+    # Database writes, reported as the "persist" timing phase
+    with phase("persist"):
+        # FAIL CASE: Add the updated prompt to the databse with status active and set the current version in prompts table to the new version
+        if agent_json.get("quality") == "fail":
+           new_prompt_content = EditPromptIn(prompt_content=agent_json.get("prompt_content"))
+           # 1. Creates a new prompt version and updates the prompt_id to point to it
+           await update_prompt_version(prompt, new_prompt_content, db)
        
-       # 2. Set the new version (latest version) to active
-       updated_prompt_details = set_prompt_active(prompt_version_id, db)
+           # 2. Set the new version (latest version) to active
+           updated_prompt_details = await set_prompt_active(prompt_version_id, db)
 
-    # PASS CASE: Set the status flag to active in prompt_versions table for the passed prompt
-    elif agent_json.get("quality") == "pass":
-        updated_prompt_details = set_prompt_active(prompt_version_id, db)
+        # PASS CASE: Set the status flag to active in prompt_versions table for the passed prompt
+        elif agent_json.get("quality") == "pass":
+            updated_prompt_details = await set_prompt_active(prompt_version_id, db)
 
-    # Save the test result with reason
-    test_result = add_result(TestResultIn(
-        test_id=t_id,
-        prompt_version_id=prompt_version_id,
-        result=agent_json.get("quality"),
-        reason=agent_json.get("reason")
-        ), db)
+        # Save the test result with reason
+        test_result = await add_result(TestResultIn(
+            test_id=t_id,
+            prompt_version_id=prompt_version_id,
+            result=agent_json.get("quality"),
+            reason=agent_json.get("reason"),
+            faithfulness=agent_json.get("faithfulness"),
+            context_relevancy=agent_json.get("context_relevancy"),
+            answer_relevancy=agent_json.get("answer_relevancy")
+            ), db, llm_calls=agent_json.get("llm_calls"))
 
     return EvaluationAPIOut(
         test_id=t_id,
@@ -103,7 +90,254 @@ async def make_evaluation(prompt_version_id: UUID,
         prompt_version_id=prompt_version_id,
         result=test_result.result,
         reason=test_result.reason,
+        faithfulness=test_result.faithfulness,
+        context_relevancy=test_result.context_relevancy,
+        answer_relevancy=test_result.answer_relevancy,
         new_prompt_content=agent_json.get("prompt_content") if agent_json.get("quality") == "fail" else None  # change this logic
     )
 
 
+# POST
+@router.post("/version/{prompt_version_id}/run", response_model=BatchEvaluationOut, status_code=status.HTTP_200_OK)
+async def run_version_evaluation(prompt_version_id: UUID,
+                                 concurrency: Optional[int] = Query(None, ge=1, le=MAX_CONCURRENCY, description="Test cases evaluated at once (defaults to settings.eval_concurrency)."),
+                                 optimize: Literal["per_case", "aggregate"] = "per_case",
+                                 early_stop: EarlyStopParams = Depends(),
+                                 db: AsyncSession = Depends(get_db),
+                                 agent: "EvaluatorAgent" = Depends(get_agent),
+                                 rag_client: httpx.AsyncClient = Depends(get_rag_client)):
+    """Evaluate a prompt version against every test case of its prompt.
+       1. Get the prompt version and all test cases of its prompt from the database
+       2. Evaluate the test cases concurrently, at most `concurrency` at a time (defaults to settings.eval_concurrency);
+          with target_pass_rate, stop starting new test cases once that pass rate is clearly out of reach or exceeded
+       3. Save all the test results at once; test cases that could not be evaluated (RAG error, rate limit, ...)
+          are reported in errors instead of failing the whole run
+       4. With optimize=aggregate, rewrite the prompt once from all the failed test cases and save it as one new version
+       With optimize=per_case (default), no new prompt versions are created here: the rewritten
+       prompt for each failed test case is only returned in its new_prompt_content.
+       With optimize=aggregate, the test cases are only scored (no per-case rewrites) and the consolidated
+       rewrite is saved as a single new, inactive version that does not become the prompt's current version;
+       compare it with GET /results/compare before activating it. Its LLM calls count in the evaluated version's usage."""
+
+    target_version = await db.get(PromptVersion, prompt_version_id)
+    if not target_version:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Prompt version not found")
+
+    test_cases = (await db.execute(
+        select(TestCase).where(TestCase.prompt_id == target_version.prompt_id)
+    )).scalars().all()
+    if not test_cases:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No test cases found for this prompt")
+
+    all_results, stopped_early = await evaluate_test_cases(
+        target_version.prompt_content,
+        test_cases,
+        agent,
+        rag_client,
+        concurrency or get_settings().eval_concurrency,
+        score_only=optimize == "aggregate",
+        early_stop=early_stop
+    )
+    errors = [
+        EvaluationError(test_id=test_case.test_id,
+                        detail=agent_json.detail if isinstance(agent_json, HTTPException) else "Evaluation failed")
+        for test_case, agent_json in zip(test_cases, all_results) if isinstance(agent_json, Exception)
+    ]
+    skipped = all_results.count(None)
+    # Only the test cases evaluated successfully before the run stopped (all of them without errors or early stopping)
+    evaluated = [(test_case, agent_json) for test_case, agent_json in zip(test_cases, all_results) if isinstance(agent_json, dict)]
+    test_cases, agent_results = [test_case for test_case, _ in evaluated], [agent_json for _, agent_json in evaluated]
+
+    # Save all the test results in one transaction
+    with phase("persist"):
+        test_results = await add_results([
+            TestResultIn(
+                test_id=test_case.test_id,
+                prompt_version_id=prompt_version_id,
+                result=agent_json.get("quality"),
+                reason=agent_json.get("reason"),
+                faithfulness=agent_json.get("faithfulness"),
+                context_relevancy=agent_json.get("context_relevancy"),
+                answer_relevancy=agent_json.get("answer_relevancy")
+            ) for test_case, agent_json in zip(test_cases, agent_results)
+        ], db, llm_calls=[agent_json.get("llm_calls") for agent_json in agent_results])
+
+    results = [
+        EvaluationAPIOut(
+            test_id=test_result.test_id,
+            prompt_id=target_version.prompt_id,
+            prompt_version_id=prompt_version_id,
+            result=test_result.result,
+            reason=test_result.reason,
+            faithfulness=test_result.faithfulness,
+            context_relevancy=test_result.context_relevancy,
+            answer_relevancy=test_result.answer_relevancy,
+            new_prompt_content=agent_json.get("prompt_content") if agent_json.get("quality") == "fail" and optimize == "per_case" else None
+        ) for test_result, agent_json in zip(test_results, agent_results)
+    ]
+    passed = sum(1 for r in results if r.result == "pass")
+
+    optimization = None
+    failures = [
+        FailedCase(
+            query=test_case.question,
+            rag_ans=agent_json.get("rag_ans", ""),
+            correct_answer=test_case.answer,
+            reason=agent_json.get("reason") or "",
+            faithfulness=agent_json.get("faithfulness"),
+            context_relevancy=agent_json.get("context_relevancy"),
+            answer_relevancy=agent_json.get("answer_relevancy")
+        ) for test_case, agent_json in zip(test_cases, agent_results) if agent_json.get("quality") == "fail"
+    ]
+    if optimize == "aggregate" and failures:
+        with recording() as optimize_calls:
+            new_prompt_content, rewrite_calls = await agent.aoptimize(target_version.prompt_content, failures)
+        with phase("persist"):
+            # A new version beside the evaluated one: the prompt's current version only moves once the rewrite is tested
+            new_version = await add_prompt_version(target_version.prompt_id, new_prompt_content, db)
+            # Charged to the evaluated version, whose failures the rewrite was made from
+            await add_llm_calls(optimize_calls, prompt_version_id, db)
+            await db.commit()
+        optimization = OptimizationOut(
+            new_version_id=new_version.version_id,
+            version_number=new_version.version_number,
+            prompt_content=new_version.prompt_content,
+            failures=len(failures),
+            rewrite_calls=rewrite_calls
+        )
+
+    return BatchEvaluationOut(
+        prompt_id=target_version.prompt_id,
+        prompt_version_id=prompt_version_id,
+        total=len(results),
+        passed=passed,
+        failed=len(results) - passed,
+        results=results,
+        errored=len(errors),
+        errors=errors,
+        optimization=optimization,
+        skipped=skipped,
+        stopped_early=stopped_early
+    )
+
+
+def sse_event(event: str, data: str) -> str:
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+# POST
+@router.post("/version/{prompt_version_id}/run/stream",
+             status_code=status.HTTP_200_OK,
+             response_class=StreamingResponse,
+             responses={200: {"content": {"text/event-stream": {}},
+                              "description": "`result` events (EvaluationAPIOut), `error` events and a final `summary` event (EvaluationStreamSummary)."}})
+async def stream_version_evaluation(prompt_version_id: UUID,
+                                    concurrency: Optional[int] = Query(None, ge=1, le=MAX_CONCURRENCY, description="Test cases evaluated at once (defaults to settings.eval_concurrency)."),
+                                    db: AsyncSession = Depends(get_db),
+                                    agent: "EvaluatorAgent" = Depends(get_agent),
+                                    rag_client: httpx.AsyncClient = Depends(get_rag_client)):
+    """Same evaluation as /run, streamed as server-sent events while it progresses.
+       1. Get the prompt version and all test cases of its prompt from the database
+       2. Evaluate the test cases concurrently; as each one finishes, save its result and send a `result` event
+          (or an `error` event with the test_id and detail if it could not be evaluated)
+       3. Send a `summary` event with the pass/fail counts"""
+
+    target_version = await db.get(PromptVersion, prompt_version_id)
+    if not target_version:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Prompt version not found")
+
+    test_cases = (await db.execute(
+        select(TestCase).where(TestCase.prompt_id == target_version.prompt_id)
+    )).scalars().all()
+    if not test_cases:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No test cases found for this prompt")
+
+    prompt_id = target_version.prompt_id
+    prompt_content = target_version.prompt_content
+
+    async def events():
+        passed = failed = errored = 0
+        # The request session may be closed while streaming, so results are saved with a session of our own
+        async with get_async_sessionmaker()() as stream_db:
+            async for test_case, agent_json in iter_evaluations(prompt_content, test_cases, agent, rag_client,
+                                                                concurrency or get_settings().eval_concurrency):
+                if isinstance(agent_json, Exception):
+                    errored += 1
+                    detail = agent_json.detail if isinstance(agent_json, HTTPException) else "Evaluation failed"
+                    yield sse_event("error", json.dumps({"test_id": str(test_case.test_id), "detail": detail}))
+                    continue
+
+                with phase("persist"):
+                    test_result = await add_result(TestResultIn(
+                        test_id=test_case.test_id,
+                        prompt_version_id=prompt_version_id,
+                        result=agent_json.get("quality"),
+                        reason=agent_json.get("reason"),
+                        faithfulness=agent_json.get("faithfulness"),
+                        context_relevancy=agent_json.get("context_relevancy"),
+                        answer_relevancy=agent_json.get("answer_relevancy")
+                    ), stream_db, llm_calls=agent_json.get("llm_calls"))
+                if test_result.result == "pass":
+                    passed += 1
+                else:
+                    failed += 1
+
+                yield sse_event("result", EvaluationAPIOut(
+                    test_id=test_result.test_id,
+                    prompt_id=prompt_id,
+                    prompt_version_id=prompt_version_id,
+                    result=test_result.result,
+                    reason=test_result.reason,
+                    faithfulness=test_result.faithfulness,
+                    context_relevancy=test_result.context_relevancy,
+                    answer_relevancy=test_result.answer_relevancy,
+                    new_prompt_content=agent_json.get("prompt_content") if agent_json.get("quality") == "fail" else None
+                ).model_dump_json())
+
+        yield sse_event("summary", EvaluationStreamSummary(
+            prompt_id=prompt_id,
+            prompt_version_id=prompt_version_id,
+            total=len(test_cases),
+            passed=passed,
+            failed=failed,
+            errored=errored
+        ).model_dump_json())
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+# POST
+@router.post("/version/{prompt_version_id}/runs", response_model=EvaluationRunOut, status_code=status.HTTP_202_ACCEPTED)
+async def create_evaluation_run(prompt_version_id: UUID,
+                                db: AsyncSession = Depends(get_db)):
+    """Queue a background evaluation of a prompt version against every test case of its prompt.
+       Returns immediately; the jobs are processed by `python -m src.worker` and the
+       progress can be followed with GET /eval/runs/{run_id}."""
+    return await enqueue_run(prompt_version_id, db)
+
+
+# GET
+@router.get("/runs/{run_id}", response_model=EvaluationRunOut, status_code=status.HTTP_200_OK)
+async def get_evaluation_run(run_id: UUID,
+                             db: AsyncSession = Depends(get_db)):
+    return await get_run(run_id, db)
+
+
+# GET
+@router.get("/runs/{run_id}/llm_usage", response_model=LLMUsageSummary, status_code=status.HTTP_200_OK)
+async def get_evaluation_run_llm_usage(run_id: UUID,
+                                       db: AsyncSession = Depends(get_db)):
+    """Tokens, latency and estimated cost of the LLM calls made so far by an evaluation run."""
+    await get_run(run_id, db)
+    return await run_usage(run_id, db)
+
+
+# GET
+@router.get("/cache", response_model=LLMCacheStats, status_code=status.HTTP_200_OK)
+async def get_cache_stats(agent: "EvaluatorAgent" = Depends(get_agent)) -> LLMCacheStats:
+    """Hit/miss counters of the LLM cache used by the evaluator in this worker."""
+    if agent.cache is None:
+        return LLMCacheStats(enabled=False)
+    return LLMCacheStats(enabled=True, **await agent.cache.astats())
@@ -1,50 +1,69 @@
-from fastapi import APIRouter, Depends, status, HTTPException
+from fastapi import APIRouter, Depends, status, HTTPException, Response, Query
 from src.schemas import DisplayVersion
 from src.db.database import get_db
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from src.db.models import Prompt, PromptVersion
-from typing import List
+from src.db.models import Prompt, PromptVersion, VersionResultStats
+from typing import List, Literal, Optional
 from src.services.update_prompt import set_prompt_active
+from src.services.pagination import PageParams, keyset, page, set_next_cursor
+from src.services.version_stats import result_stats
 from uuid import UUID
 
 router = APIRouter(prefix="/versions", tags=["Prompt Versions"])
 
 # GET - /versions/{prompt_id}
 @router.get("/{prompt_id}", response_model=List[DisplayVersion], status_code=status.HTTP_200_OK)
-async def get_prompt_versions(prompt_id: UUID, db: Session = Depends(get_db)) -> List[DisplayVersion]:
-    """Retrieve all versions of a specific prompt by its id."""
-    prompt = db.get(Prompt, prompt_id)
+async def get_prompt_versions(prompt_id: UUID,
+                              response: Response,
+                              status_filter: Optional[Literal["active", "inactive"]] = Query(None, alias="status"),
+                              page_params: PageParams = Depends(),
+                              db: AsyncSession = Depends(get_db)) -> List[DisplayVersion]:
+    """Retrieve a page of versions of a specific prompt by its id, ordered by version number."""
+    prompt = await db.get(Prompt, prompt_id)
     if not prompt:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Prompt not found")
     
     query = (
         select(
-            PromptVersion
+            PromptVersion,
+            VersionResultStats
+        ).outerjoin(
+            VersionResultStats,
+            VersionResultStats.version_id == PromptVersion.version_id
         ).where(PromptVersion.prompt_id == prompt.prompt_id)
     )
-    versions = db.execute(query).scalars().all()
-    if not versions:
+    if status_filter:
+        query = query.where(PromptVersion.status == status_filter)
+    order_by = (PromptVersion.version_number, PromptVersion.version_id)
+    query = keyset(query, order_by, page_params)
+    versions, next_cursor = page((await db.execute(query)).all(), page_params,
+                                 lambda row: (row.PromptVersion.version_number, row.PromptVersion.version_id))
+    set_next_cursor(response, next_cursor)
+    if not versions and not page_params.after:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No versions found for this prompt")
     return [
-        DisplayVersion.model_validate(version) for version in versions
+        DisplayVersion.model_validate(row.PromptVersion).model_copy(update={"result_stats": result_stats(row.VersionResultStats)})
+        for row in versions
     ]
 
 
 # GET - /versions/version/{version_id}
 @router.get("/version/{version_id}", response_model=DisplayVersion, status_code=status.HTTP_200_OK)
-async def get_prompt_version_by_id(version_id: UUID, db: Session = Depends(get_db)) -> DisplayVersion:
+async def get_prompt_version_by_id(version_id: UUID, db: AsyncSession = Depends(get_db)) -> DisplayVersion:
     """Retrieve a specific prompt version by its version id."""
-    version = db.get(PromptVersion, version_id)
+    version = await db.get(PromptVersion, version_id)
     if not version:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Prompt version not found")
-    return DisplayVersion.model_validate(version)
+    return DisplayVersion.model_validate(version).model_copy(
+        update={"result_stats": result_stats(await db.get(VersionResultStats, version_id))}
+    )
 
 
 # PATCH - /versions/{version_id}/activate
 @router.patch("/{version_id}/activate", response_model=DisplayVersion, status_code=status.HTTP_200_OK)
 async def activate_prompt_version(version_id: UUID,
-                                  db: Session = Depends(get_db)) -> DisplayVersion:
+                                  db: AsyncSession = Depends(get_db)) -> DisplayVersion:
     """Set a specific prompt version as the active version for its parent prompt."""
-    updated_version = set_prompt_active(version_id, db)
+    updated_version = await set_prompt_active(version_id, db)
     return DisplayVersion.model_validate(updated_version)
@@ -1,18 +1,19 @@
-from fastapi import APIRouter, Depends, status, HTTPException
+from fastapi import APIRouter, Depends, status, HTTPException, Response, Query
 from src.schemas import PromptIn, PromptOut, DisplayPrompt, EditPromptIn
 from src.db.database import get_db
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from src.db.models import Prompt, PromptVersion
-from typing import List
+from typing import List, Literal, Optional
 from uuid import UUID
 from src.services.display_prompt import display_all_prompts, display_prompt
 from src.services.update_prompt import update_prompt_version, set_prompt_active
+from src.services.pagination import PageParams, set_next_cursor
 
 router = APIRouter(prefix="/prompts", tags=["Prompts"])
 
 # POST - /prompts/
 @router.post("/", response_model=PromptOut, status_code=status.HTTP_201_CREATED)
-async def create_prompt(prompt_data: PromptIn, db: Session = Depends(get_db)):
+async def create_prompt(prompt_data: PromptIn, db: AsyncSession = Depends(get_db)):
     """Create a new prompt along with its initial version.
     1. Create a new prompt_id in the prompts table
     2. Create a new version in the prompt_versions table linked to that prompt_id
@@ -22,7 +23,7 @@ async def create_prompt(prompt_data: PromptIn, db: Session = Depends(get_db)):
     # Create the Parent container first
     new_prompt = Prompt(prompt_name=prompt_data.prompt_name)
     db.add(new_prompt)
-    db.flush() # This generates the new_prompt.prompt_id UUID
+    await db.flush() # This generates the new_prompt.prompt_id UUID
 
     # Create the Version linked to that ID
     new_version = PromptVersion(
@@ -31,42 +32,47 @@ async def create_prompt(prompt_data: PromptIn, db: Session = Depends(get_db)):
         version_number=1
     )
     db.add(new_version)
-    db.flush() # This generates the new_version.version_id UUID
+    await db.flush() # This generates the new_version.version_id UUID
 
     # 3. Point the Parent to the New Version
     new_prompt.current_version_id = new_version.version_id
     
-    db.commit() # Now everything is saved at once!
-    db.refresh(new_prompt)
+    await db.commit() # Now everything is saved at once!
+    await db.refresh(new_prompt)
     return new_prompt
 
 # GET - /prompts/
 @router.get("/", response_model=List[DisplayPrompt], status_code=status.HTTP_200_OK)
-async def get_prompts(db: Session = Depends(get_db)) -> List[DisplayPrompt]:
-    """Retrieve all prompts with their current version details."""
-    return display_all_prompts(db) 
+async def get_prompts(response: Response,
+                      status_filter: Optional[Literal["active", "inactive"]] = Query(None, alias="status"),
+                      page_params: PageParams = Depends(),
+                      db: AsyncSession = Depends(get_db)) -> List[DisplayPrompt]:
+    """Retrieve a page of prompts with their current version details."""
+    prompts, next_cursor = await display_all_prompts(db, page_params, status_filter)
+    set_next_cursor(response, next_cursor)
+    return prompts
 
 
 # GET - /prompts/{prompt_id}
 @router.get("/{prompt_id}", response_model=DisplayPrompt, status_code=status.HTTP_200_OK)
-async def get_prompt_by_id(prompt_id: UUID, db: Session = Depends(get_db)) -> DisplayPrompt:
+async def get_prompt_by_id(prompt_id: UUID, db: AsyncSession = Depends(get_db)) -> DisplayPrompt:
     """Retrieve a specific prompt by its ID along with its current version details."""
-    prompt = db.get(Prompt, prompt_id)
+    prompt = await db.get(Prompt, prompt_id)
     if not prompt:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Prompt not found")
-    return display_prompt(prompt, db)
+    return await display_prompt(prompt, db)
 
 # PUT - /prompts/{prompt_id}
 @router.put("/{prompt_id}", response_model=DisplayPrompt, status_code=status.HTTP_201_CREATED)
 async def update_prompt(prompt_id: UUID, 
                         prompt_data: EditPromptIn,
-                        db: Session = Depends(get_db)) -> DisplayPrompt:
+                        db: AsyncSession = Depends(get_db)) -> DisplayPrompt:
  
 
     # Fetch the current prompt (row) to get its current version number
-    current_prompt = db.get(Prompt, prompt_id)
+    current_prompt = await db.get(Prompt, prompt_id)
     if not current_prompt:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Prompt not found")
     
-    return update_prompt_version(current_prompt, prompt_data, db)
+    return await update_prompt_version(current_prompt, prompt_data, db)
 
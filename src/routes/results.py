@@ -1,26 +1,53 @@
-from fastapi import APIRouter, Depends, status, HTTPException
-from src.schemas import DisplayTestResult
+from fastapi import APIRouter, Depends, status, HTTPException, Response, Query
+from src.schemas import DisplayTestResult, LLMUsageSummary, ResultsSummary, VersionComparison
 from src.db.database import get_db
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from src.db.models import TestResults, TestCase
-from typing import List
-from src.schemas import DisplayTestResult
+from src.db.models import TestResults, TestCase, PromptVersion
+from typing import List, Literal, Optional
+from uuid import UUID
+from src.services.pagination import PageParams, keyset, page, set_next_cursor
+from src.services.llm_usage import version_usage
+from src.services.result_summary import version_summary
+from src.services.compare_versions import compare_versions
 
 router = APIRouter(prefix="/results", tags=["Results"])
 
+# GET - /results/compare (declared before /{version_id}, which would otherwise match it)
+@router.get("/compare", response_model=VersionComparison, status_code=status.HTTP_200_OK)
+async def compare_version_results(response: Response,
+                                  base: UUID = Query(description="Version to compare against, usually the active one."),
+                                  candidate: UUID = Query(description="Version being considered for activation."),
+                                  change: Optional[Literal["fixed", "regressed", "unchanged", "unmatched"]] = None,
+                                  page_params: PageParams = Depends(),
+                                  db: AsyncSession = Depends(get_db)) -> VersionComparison:
+    """Results of two versions of a prompt side by side, per test case, with fixed/regressed/unchanged counts"""
+    comparison, next_cursor = await compare_versions(base, candidate, page_params, change, db)
+    set_next_cursor(response, next_cursor)
+    return comparison
+
+
 # GET - /results/{version_id}
 @router.get("/{version_id}", response_model=List[DisplayTestResult], status_code=status.HTTP_200_OK)
-async def get_results_by_version_id(version_id: str, db: Session = Depends(get_db)) -> List[DisplayTestResult]:
-    """Retrieve all test results for a specific prompt version"""
+async def get_results_by_version_id(version_id: UUID,
+                                    response: Response,
+                                    result_filter: Optional[Literal["pass", "fail"]] = Query(None, alias="result"),
+                                    page_params: PageParams = Depends(),
+                                    db: AsyncSession = Depends(get_db)) -> List[DisplayTestResult]:
+    """Retrieve a page of test results for a specific prompt version, ordered by test case id.
+    The order follows ix_test_results_prompt_version_id_test_id, so a page costs the same however many results the version has"""
     stmt = (
         select(
-            TestCase.test_id,
+            TestResults.result_id,
+            TestResults.test_id,
             TestResults.prompt_version_id,
             TestCase.question,
             TestCase.answer,
             TestResults.result,
-            TestResults.reason
+            TestResults.reason,
+            TestResults.faithfulness,
+            TestResults.context_relevancy,
+            TestResults.answer_relevancy
         ).join(
             TestResults,
             TestCase.test_id == TestResults.test_id
@@ -28,8 +55,13 @@ async def get_results_by_version_id(version_id: str, db: Session = Depends(get_d
             TestResults.prompt_version_id == version_id
         )
     )
-    result = db.execute(stmt).all()
-    if not result:
+    if result_filter:
+        stmt = stmt.where(TestResults.result == result_filter)
+    order_by = (TestResults.test_id, TestResults.result_id)
+    stmt = keyset(stmt, order_by, page_params)
+    result, next_cursor = page((await db.execute(stmt)).all(), page_params, lambda row: (row.test_id, row.result_id))
+    set_next_cursor(response, next_cursor)
+    if not result and not page_params.after:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No results found")
 
     return [
@@ -39,6 +71,29 @@ async def get_results_by_version_id(version_id: str, db: Session = Depends(get_d
             question=row.question,
             answer=row.answer,
             result=row.result,
-            reason=row.reason
+            reason=row.reason,
+            faithfulness=row.faithfulness,
+            context_relevancy=row.context_relevancy,
+            answer_relevancy=row.answer_relevancy
         ) for row in result
     ]
+
+
+# GET - /results/{version_id}/llm_usage
+@router.get("/{version_id}/llm_usage", response_model=LLMUsageSummary, status_code=status.HTTP_200_OK)
+async def get_llm_usage_by_version_id(version_id: UUID,
+                                      db: AsyncSession = Depends(get_db)) -> LLMUsageSummary:
+    """Tokens, latency and estimated cost of the LLM calls behind the test results of a prompt version"""
+    if not await db.get(PromptVersion, version_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Prompt version not found")
+    return await version_usage(version_id, db)
+
+
+# GET - /results/{version_id}/summary
+@router.get("/{version_id}/summary", response_model=ResultsSummary, status_code=status.HTTP_200_OK)
+async def get_results_summary_by_version_id(version_id: UUID,
+                                            db: AsyncSession = Depends(get_db)) -> ResultsSummary:
+    """Pass rate and judge score distributions (mean, percentiles) of the test results of a prompt version"""
+    if not await db.get(PromptVersion, version_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Prompt version not found")
+    return await version_summary(version_id, db)
@@ -1,20 +1,30 @@
-from fastapi import APIRouter, Depends, status, HTTPException
-from src.schemas import TestCaseIn, TestCaseOut
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, status, HTTPException, Request, Response
+from fastapi.exceptions import RequestValidationError
+from pydantic import TypeAdapter, ValidationError
+from src.schemas import TestCaseIn, TestCaseOut, BulkTestCaseOut
+from sqlalchemy.ext.asyncio import AsyncSession
 from src.db.database import get_db
-from src.db.models import TestCase
+from src.db.models import Prompt, TestCase
 from uuid import UUID
 from sqlalchemy import select
 from typing import List
-from src.services.add_test_case import add_test_case
+from src.services.add_test_case import add_test_case, add_test_cases
+from src.services.pagination import PageParams, keyset, page, set_next_cursor
+import json
 
 router = APIRouter(prefix="/test_cases", tags=["Test Cases"])
 
 # GET - /{prompt_id}
 @router.get("/{prompt_id}", response_model=List[TestCaseOut], status_code=status.HTTP_200_OK)
-async def get_test_cases_by_id(prompt_id: UUID, db: Session = Depends(get_db)) -> List[TestCaseOut]:
-    stmt = select(TestCase).where(TestCase.prompt_id == prompt_id)
-    result = db.execute(stmt).scalars().all()
+async def get_test_cases_by_id(prompt_id: UUID,
+                               response: Response,
+                               page_params: PageParams = Depends(),
+                               db: AsyncSession = Depends(get_db)) -> List[TestCaseOut]:
+    """Retrieve a page of test cases for a prompt, oldest first."""
+    order_by = (TestCase.created, TestCase.test_id)
+    stmt = keyset(select(TestCase).where(TestCase.prompt_id == prompt_id), order_by, page_params)
+    result, next_cursor = page((await db.execute(stmt)).scalars().all(), page_params, lambda tc: (tc.created, tc.test_id))
+    set_next_cursor(response, next_cursor)
     return [
         TestCaseOut.model_validate(tc) for tc in result
     ]
@@ -22,8 +32,8 @@ async def get_test_cases_by_id(prompt_id: UUID, db: Session = Depends(get_db)) -
 
 # GET - /{test_id} 
 @router.get("/test_case/{test_id}", response_model=TestCaseOut, status_code=status.HTTP_200_OK)
-async def get_test_case_by_id(test_id: UUID, db: Session = Depends(get_db)) -> TestCaseOut:
-    test_case = db.get(TestCase, test_id)
+async def get_test_case_by_id(test_id: UUID, db: AsyncSession = Depends(get_db)) -> TestCaseOut:
+    test_case = await db.get(TestCase, test_id)
     if not test_case:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Test case not found")
     return TestCaseOut.model_validate(test_case)
@@ -31,34 +41,63 @@ async def get_test_case_by_id(test_id: UUID, db: Session = Depends(get_db)) -> T
 
 # POST - /{prompt_id}
 @router.post("/{prompt_id}", response_model=TestCaseOut, status_code=status.HTTP_201_CREATED)
-async def create_test_case(prompt_id: UUID, test_case: TestCaseIn, db: Session = Depends(get_db)) -> TestCaseOut:
-    test_case_obj = add_test_case(test_case, prompt_id, db)
+async def create_test_case(prompt_id: UUID, test_case: TestCaseIn, db: AsyncSession = Depends(get_db)) -> TestCaseOut:
+    test_case_obj = await add_test_case(test_case, prompt_id, db)
     return TestCaseOut.model_validate(test_case_obj) 
 
 
+# POST - /{prompt_id}/bulk
+@router.post("/{prompt_id}/bulk", response_model=BulkTestCaseOut, status_code=status.HTTP_201_CREATED,
+             openapi_extra={"requestBody": {"required": True, "content": {
+                 "application/json": {"schema": {"type": "array", "items": TestCaseIn.model_json_schema()}},
+                 "application/x-ndjson": {"schema": {"type": "string"}},
+             }}})
+async def create_test_cases_bulk(prompt_id: UUID, request: Request, db: AsyncSession = Depends(get_db)) -> BulkTestCaseOut:
+    """Create many test cases at once from a JSON list or an NDJSON body (one test case per line).
+    The whole list is validated first, then inserted in a single transaction."""
+    prompt = await db.get(Prompt, prompt_id)
+    if not prompt:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Prompt not found")
+
+    body = await request.body()
+    try:
+        if "ndjson" in request.headers.get("content-type", ""):
+            items = [json.loads(line) for line in body.splitlines() if line.strip()]
+        else:
+            items = json.loads(body)
+        test_cases = TypeAdapter(List[TestCaseIn]).validate_python(items)
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid JSON: {e}")
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+
+    test_ids = await add_test_cases(test_cases, prompt_id, db)
+    return BulkTestCaseOut(count=len(test_ids), test_ids=test_ids)
+
+
 # PUT -/{test_id}
 @router.put("/{test_id}", response_model=TestCaseOut, status_code=status.HTTP_201_CREATED)
-async def update_test_case(test_id: UUID, updated_data: TestCaseIn, db: Session = Depends(get_db)) -> TestCaseOut:
-    test_case = db.get(TestCase, test_id)
+async def update_test_case(test_id: UUID, updated_data: TestCaseIn, db: AsyncSession = Depends(get_db)) -> TestCaseOut:
+    test_case = await db.get(TestCase, test_id)
     if not test_case:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Test case not found")
     
     test_case.question = updated_data.question
     test_case.answer = updated_data.answer
     
-    db.commit()
-    db.refresh(test_case)
+    await db.commit()
+    await db.refresh(test_case)
     return TestCaseOut.model_validate(test_case) 
 
 
 # DELETE - /{test_id}
 @router.delete("/{test_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_test_case(test_id: UUID, db: Session = Depends(get_db)):
-    test_case = db.get(TestCase, test_id)
+async def delete_test_case(test_id: UUID, db: AsyncSession = Depends(get_db)):
+    test_case = await db.get(TestCase, test_id)
     if not test_case:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Test case not found")
     
-    db.delete(test_case)
-    db.commit()
+    await db.delete(test_case)
+    await db.commit()
     return None  # good practice to return None for 204 responses 
 
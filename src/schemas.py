@@ -1,7 +1,7 @@
 from pydantic import BaseModel, ConfigDict, Field
 from datetime import datetime
 from uuid import UUID
-from typing import Literal, Optional
+from typing import List, Literal, Optional
 
 class PromptIn(BaseModel):
     """Schema for creating a new prompt."""
@@ -20,6 +20,17 @@ class PromptOut(BaseModel):
 
     model_config = ConfigDict(from_attributes=True)
 
+class ResultStats(BaseModel):
+    """Totals of the test results saved for a prompt version."""
+    total: int = Field(description="Number of test results.")
+    passed: int = Field(description="Number of passed test results.")
+    failed: int = Field(description="Number of failed test results.")
+    pass_rate: Optional[float] = Field(description="passed / total.")
+    scored: int = Field(description="Number of test results with judge scores.")
+    mean_faithfulness: Optional[float] = Field(description="Mean faithfulness score.")
+    mean_context_relevancy: Optional[float] = Field(description="Mean context relevancy score.")
+    mean_answer_relevancy: Optional[float] = Field(description="Mean answer relevancy score.")
+
 class DisplayPrompt(BaseModel):
     """Schema for displaying prompt with its current version details."""
     prompt_id: UUID = Field(description="The unique identifier of the prompt.")
@@ -28,6 +39,7 @@ class DisplayPrompt(BaseModel):
     prompt_name: str = Field(description="The name of the prompt.")
     prompt_content: str = Field(description="The content of the prompt.")
     status: str = Field(description="The status of the prompt version.")
+    result_stats: Optional[ResultStats] = Field(default=None, description="Test results of the current version, None if it was never evaluated.")
 
 class DisplayVersion(BaseModel):
     """Schema for displaying a specific prompt version."""
@@ -37,6 +49,7 @@ class DisplayVersion(BaseModel):
     prompt_content: str = Field(description="The content of the prompt.")
     status: str = Field(description="The status of the prompt version.")
     created: datetime = Field(description="The creation timestamp of the prompt version.")
+    result_stats: Optional[ResultStats] = Field(default=None, description="Test results of this version, None if it was never evaluated.")
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -56,15 +69,26 @@ class TestCaseOut(BaseModel):
 
     model_config = ConfigDict(from_attributes=True)
 
+class BulkTestCaseOut(BaseModel):
+    """Result of a bulk test case import."""
+    count: int = Field(description="Number of test cases created.")
+    test_ids: List[UUID] = Field(description="Identifiers of the created test cases, in input order.")
+
 
-class TestResultIn(BaseModel):
+class JudgeScores(BaseModel):
+    """Scores computed by the evaluate_prompt judge (None for results saved before they were recorded)."""
+    faithfulness: Optional[float] = Field(default=None, description="How strictly the RAG answer is grounded in the context (0-1).")
+    context_relevancy: Optional[float] = Field(default=None, description="How relevant the retrieved context is to the query (0-1).")
+    answer_relevancy: Optional[float] = Field(default=None, description="How well the RAG answer addresses the query (0-1).")
+
+class TestResultIn(JudgeScores):
     """Test Result input schema."""
     test_id: UUID = Field(description="The test case being evaluated.")
     prompt_version_id: UUID = Field(description="The version of the prompt being tested.")
     result: str = Field(description="Result of the test case evaluation.")
     reason: str = Field(description="Explanation for the test result.")
 
-class TestResultOut(BaseModel):
+class TestResultOut(JudgeScores):
     """Final test result after saving it."""
     result_id: UUID = Field(description="The test case being evaluated.")
     test_id: UUID = Field(description="The test case being evaluated.")
@@ -74,7 +98,7 @@ class TestResultOut(BaseModel):
 
     model_config = ConfigDict(from_attributes=True)
 
-class EvaluationAPIOut(BaseModel):
+class EvaluationAPIOut(JudgeScores):
     """Final test result from evaluation endpoint."""
     test_id: UUID = Field(description="The test case being evaluated.")
     prompt_id: UUID = Field(description="The prompt associated with the test case.")
@@ -85,7 +109,134 @@ class EvaluationAPIOut(BaseModel):
 
     model_config = ConfigDict(from_attributes=True)
 
-class DisplayTestResult(BaseModel):
+class OptimizationOut(BaseModel):
+    """Prompt version created by an aggregate optimization round."""
+    new_version_id: UUID = Field(description="The new (inactive) prompt version with the consolidated rewrite.")
+    version_number: int = Field(description="Version number of the new prompt version.")
+    prompt_content: str = Field(description="The rewritten prompt content.")
+    failures: int = Field(description="Number of failed test cases the rewrite is based on.")
+    rewrite_calls: int = Field(description="LLM calls made for the rewrite (more than one when the failures exceed the context budget).")
+
+class EvaluationError(BaseModel):
+    """A test case of a batch run that could not be evaluated."""
+    test_id: UUID = Field(description="The test case that could not be evaluated.")
+    detail: str = Field(description="Why it could not be evaluated.")
+
+class BatchEvaluationOut(BaseModel):
+    """Aggregate result from evaluating a prompt version against all of its test cases."""
+    prompt_id: UUID = Field(description="The prompt associated with the test cases.")
+    prompt_version_id: UUID = Field(description="The version of the prompt being tested.")
+    total: int = Field(description="Number of test cases evaluated.")
+    passed: int = Field(description="Number of test cases that passed.")
+    failed: int = Field(description="Number of test cases that failed.")
+    results: List[EvaluationAPIOut] = Field(description="Per test case evaluation results.")
+    errored: int = Field(default=0, description="Number of test cases that could not be evaluated.")
+    errors: List[EvaluationError] = Field(default=[], description="Why each errored test case could not be evaluated.")
+    optimization: Optional[OptimizationOut] = Field(default=None, description="With optimize=aggregate and at least one failure, the version created from all of them.")
+    skipped: int = Field(default=0, description="Test cases not evaluated because the run stopped early.")
+    stopped_early: Optional[Literal["target_unreachable", "target_exceeded"]] = Field(default=None, description="Why the run stopped before evaluating every test case, if it did.")
+
+class EvaluationStreamSummary(BaseModel):
+    """Final event of a streamed evaluation, sent after every test case has finished."""
+    prompt_id: UUID = Field(description="The prompt associated with the test cases.")
+    prompt_version_id: UUID = Field(description="The version of the prompt being tested.")
+    total: int = Field(description="Number of test cases in the evaluation.")
+    passed: int = Field(description="Number of test cases that passed.")
+    failed: int = Field(description="Number of test cases that failed.")
+    errored: int = Field(description="Number of test cases that could not be evaluated.")
+
+class EvaluationRunOut(BaseModel):
+    """Progress of a background evaluation run."""
+    run_id: UUID = Field(description="The unique identifier of the evaluation run.")
+    prompt_version_id: UUID = Field(description="The version of the prompt being tested.")
+    status: str = Field(description="queued, running or completed.")
+    total: int = Field(description="Number of test cases in the run.")
+    completed: int = Field(description="Number of test cases evaluated so far.")
+    passed: int = Field(description="Number of test cases that passed.")
+    failed: int = Field(description="Number of test cases that failed.")
+    errored: int = Field(description="Number of test cases that could not be evaluated.")
+    created: datetime = Field(description="When the run was enqueued.")
+    finished: Optional[datetime] = Field(description="When the last test case finished.")
+
+    model_config = ConfigDict(from_attributes=True)
+
+class LLMCallIn(BaseModel):
+    """Usage of one LLM call made while evaluating a test case."""
+    kind: str = Field(description="evaluate_prompt, update_prompt, optimize_prompt (a consolidated rewrite of a run) or agent (a model call of the agent loop).")
+    model: str = Field(description="Model that served the call.")
+    prompt_tokens: int = Field(description="Prompt tokens reported by the provider.")
+    completion_tokens: int = Field(description="Completion tokens reported by the provider.")
+    latency_ms: float = Field(description="Wall time of the call in milliseconds.")
+    cost: float = Field(description="Estimated cost in USD.")
+
+class TestCaseComparison(BaseModel):
+    """Results of one test case in the two compared prompt versions."""
+    test_id: UUID = Field(description="The unique identifier of the test case.")
+    question: str = Field(description="The question for the test case.")
+    answer: str = Field(description="The expected answer for the test case.")
+    base_result: Optional[str] = Field(description="Result in the base version (fail if any of its results failed), None if not evaluated.")
+    candidate_result: Optional[str] = Field(description="Result in the candidate version, None if not evaluated.")
+    change: Literal["fixed", "regressed", "unchanged", "unmatched"] = Field(description="fixed: fail -> pass, regressed: pass -> fail, unmatched: evaluated in only one version.")
+
+class VersionComparison(BaseModel):
+    """Test case by test case comparison of two versions of a prompt."""
+    base_version_id: UUID = Field(description="The version compared against, usually the active one.")
+    candidate_version_id: UUID = Field(description="The version being considered.")
+    total: int = Field(description="Test cases evaluated in either version.")
+    fixed: int = Field(description="Test cases failing in the base version and passing in the candidate.")
+    regressed: int = Field(description="Test cases passing in the base version and failing in the candidate.")
+    unchanged: int = Field(description="Test cases with the same result in both versions.")
+    unmatched: int = Field(description="Test cases evaluated in only one of the versions.")
+    cases: List[TestCaseComparison] = Field(description="A page of the compared test cases, in test case order.")
+
+class ScoreStats(BaseModel):
+    """Distribution of one judge score over the scored test results of a prompt version."""
+    mean: Optional[float] = Field(description="Mean score.")
+    min: Optional[float] = Field(description="Lowest score.")
+    p10: Optional[float] = Field(description="10th percentile.")
+    p50: Optional[float] = Field(description="Median.")
+    p90: Optional[float] = Field(description="90th percentile.")
+    max: Optional[float] = Field(description="Highest score.")
+
+class ResultsSummary(BaseModel):
+    """Aggregate of the test results of a prompt version."""
+    prompt_version_id: UUID = Field(description="The version of the prompt the results belong to.")
+    total: int = Field(description="Number of test results.")
+    passed: int = Field(description="Number of passed test results.")
+    failed: int = Field(description="Number of failed test results.")
+    pass_rate: Optional[float] = Field(description="passed / total, None without results.")
+    scored: int = Field(description="Number of test results with judge scores.")
+    faithfulness: ScoreStats = Field(description="Faithfulness score distribution.")
+    context_relevancy: ScoreStats = Field(description="Context relevancy score distribution.")
+    answer_relevancy: ScoreStats = Field(description="Answer relevancy score distribution.")
+
+class LLMUsageByKind(BaseModel):
+    """LLM usage aggregated over one kind of call."""
+    kind: str = Field(description="evaluate_prompt, update_prompt, optimize_prompt or agent.")
+    calls: int = Field(description="Number of LLM calls.")
+    prompt_tokens: int = Field(description="Total prompt tokens.")
+    completion_tokens: int = Field(description="Total completion tokens.")
+    cost: float = Field(description="Total estimated cost in USD.")
+    avg_latency_ms: float = Field(description="Mean latency of a call in milliseconds.")
+    max_latency_ms: float = Field(description="Slowest call in milliseconds.")
+
+class LLMUsageSummary(BaseModel):
+    """LLM usage of all the test results of a prompt version or evaluation run."""
+    calls: int = Field(description="Number of LLM calls.")
+    prompt_tokens: int = Field(description="Total prompt tokens.")
+    completion_tokens: int = Field(description="Total completion tokens.")
+    cost: float = Field(description="Total estimated cost in USD.")
+    by_kind: List[LLMUsageByKind] = Field(description="The same totals per kind of call.")
+
+class LLMCacheStats(BaseModel):
+    """Hit/miss counters of the evaluator LLM cache for this worker process."""
+    enabled: bool = Field(description="Whether the LLM cache is enabled.")
+    hits: int = Field(default=0, description="Number of LLM calls served from the cache.")
+    misses: int = Field(default=0, description="Number of LLM calls that went to the provider.")
+    hit_ratio: float = Field(default=0.0, description="hits / (hits + misses).")
+    entries: int = Field(default=0, description="Number of entries currently stored.")
+
+class DisplayTestResult(JudgeScores):
     """Schema for displaying test result for a particular version."""
     test_id: UUID = Field(description="The unique identifier of the test case.")
     prompt_version_id: UUID = Field(description="The version of the prompt being tested.")
@@ -129,11 +280,21 @@ class UpdateToolInput(BaseModel):
     quality: Literal["pass", "fail"] = Field(description="Overall quality evaluation result.")
     reason: str = Field(description="Explanation for the evaluation decision.")
 
+class FailedCase(BaseModel):
+    """A failed test case of a run, as input of the consolidated prompt rewrite."""
+    query: str = Field(description="The original user question.")
+    rag_ans: str = Field(description="The answer produced by the RAG system.")
+    correct_answer: str = Field(description="The expected or gold-standard answer.")
+    reason: str = Field(description="Why the judge failed the answer.")
+    faithfulness: Optional[float] = Field(default=None, description="Faithfulness score from evaluation.")
+    context_relevancy: Optional[float] = Field(default=None, description="Context Relevancy score from evaluation.")
+    answer_relevancy: Optional[float] = Field(default=None, description="Answer Relevancy score from evaluation.")
+
 class UpdateLLMOut(BaseModel):
     """Response from the update_prompt tool."""
     updated_prompt: str = Field(description="The refined prompt content after applying updates.")
 
-class AgentResponse(BaseModel):
+class AgentResponse(JudgeScores):
     """Response from the EvaluatorAgent."""
     quality: Literal["pass", "fail"] = Field(description="Overall quality evaluation result.")
     prompt_content: str = Field(description="The updated prompt content if quality is 'fail', else existing prompt.")
@@ -1,25 +1,71 @@
-from sqlalchemy.orm import Session 
-from src.schemas import TestCaseIn, TestCaseOut, TestResultIn, TestResultOut
-from src.db.models import TestCase, TestResults
+from sqlalchemy.ext.asyncio import AsyncSession 
+from src.schemas import TestCaseIn, TestCaseOut, TestResultIn, TestResultOut, LLMCallIn
+from src.db.models import TestCase, TestResults, LLMCall
 from src.db.database import get_db
+from src.services.version_stats import add_to_version_stats
+from src.config import get_settings
 from fastapi import Depends
+from sqlalchemy import insert
+from typing import List, Optional
 from uuid import UUID
 
-def add_test_case(test_case: TestCaseIn,
-                  prompt_id: UUID,
-                  db: Session = Depends(get_db)) -> TestCaseOut:
+async def add_test_case(test_case: TestCaseIn,
+                        prompt_id: UUID,
+                        db: AsyncSession = Depends(get_db)) -> TestCaseOut:
     new_test_case = TestCase(**test_case.model_dump(), prompt_id=prompt_id)
     db.add(new_test_case)
-    db.commit()
-    db.refresh(new_test_case)  
+    await db.commit()
+    await db.refresh(new_test_case)  
     return TestCaseOut.model_validate(new_test_case)
 
 
-def add_result(test_result: TestResultIn,
-               db: Session = Depends(get_db)) ->TestResultOut:
+async def add_test_cases(test_cases: List[TestCaseIn],
+                         prompt_id: UUID,
+                         db: AsyncSession = Depends(get_db)) -> List[UUID]:
+    """Insert many test cases in batches of settings.bulk_insert_batch_size within one transaction."""
+    rows = [{**test_case.model_dump(), "prompt_id": prompt_id} for test_case in test_cases]
+    batch_size = get_settings().bulk_insert_batch_size
+    stmt = insert(TestCase).returning(TestCase.test_id, sort_by_parameter_order=True)
+    test_ids = []
+    for start in range(0, len(rows), batch_size):
+        test_ids.extend((await db.scalars(stmt, rows[start:start + batch_size])).all())
+    await db.commit()
+    return test_ids
+
+
+async def add_result(test_result: TestResultIn,
+                     db: AsyncSession = Depends(get_db),
+                     llm_calls: Optional[List[LLMCallIn]] = None) ->TestResultOut:
+    """Save a test result, the usage of the LLM calls that produced it and the updated totals of its version, in one commit."""
     new_result = TestResults(**test_result.model_dump())
     db.add(new_result)
-    db.commit()
-    db.refresh(new_result)  
-    return TestResultOut.model_validate(new_result) 
+    await add_to_version_stats([test_result], db)
+    if llm_calls:
+        await db.flush()
+        db.add_all([LLMCall(**call.model_dump(), result_id=new_result.result_id,
+                             prompt_version_id=new_result.prompt_version_id) for call in llm_calls])
+    await db.commit()
+    await db.refresh(new_result)  
+    return TestResultOut.model_validate(new_result)
+
 
+async def add_results(test_results: List[TestResultIn],
+                      db: AsyncSession = Depends(get_db),
+                      llm_calls: Optional[List[List[LLMCallIn]]] = None) -> List[TestResultOut]:
+    """Save many test results with a single multi-row insert, and add them to their versions' totals, in one commit.
+    `llm_calls`, if given, holds the LLM call usage of each test result, in the same order."""
+    if not test_results:
+        return []
+    stmt = insert(TestResults).returning(TestResults, sort_by_parameter_order=True)
+    new_results = (await db.scalars(stmt, [result.model_dump() for result in test_results])).all()
+    saved = [TestResultOut.model_validate(result) for result in new_results]
+    call_rows = [
+        {**call.model_dump(), "result_id": result.result_id, "prompt_version_id": result.prompt_version_id}
+        for result, calls in zip(saved, llm_calls or [])
+        for call in calls
+    ]
+    if call_rows:
+        await db.execute(insert(LLMCall), call_rows)
+    await add_to_version_stats(test_results, db)
+    await db.commit()
+    return saved
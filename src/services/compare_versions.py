@@ -0,0 +1,75 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.schemas import TestCaseComparison, VersionComparison
+from src.db.models import PromptVersion, TestCase, TestResults
+from src.db.database import get_db
+from src.services.pagination import PageParams, keyset, page
+from fastapi import Depends, HTTPException, status
+from sqlalchemy import Select, case, func, select
+from typing import Optional, Tuple
+from uuid import UUID
+
+
+def _comparison(base: UUID, candidate: UUID) -> Select:
+    """One row per test case evaluated in either version, with the result of each version side by side.
+    A test case evaluated several times in a version counts as failed there if any of its results failed."""
+    # 'fail' < 'pass', so the minimum is 'fail' as soon as one result failed
+    pivot = (
+        select(
+            TestCase.test_id,
+            TestCase.created,
+            TestCase.question,
+            TestCase.answer,
+            func.min(TestResults.result).filter(TestResults.prompt_version_id == base).label("base_result"),
+            func.min(TestResults.result).filter(TestResults.prompt_version_id == candidate).label("candidate_result"),
+        )
+        .join(TestResults, TestResults.test_id == TestCase.test_id)
+        .where(TestResults.prompt_version_id.in_([base, candidate]))
+        .group_by(TestCase.test_id, TestCase.created, TestCase.question, TestCase.answer)
+        .subquery()
+    )
+    change = case(
+        (pivot.c.base_result.is_(None) | pivot.c.candidate_result.is_(None), "unmatched"),
+        (pivot.c.base_result == pivot.c.candidate_result, "unchanged"),
+        (pivot.c.candidate_result == "pass", "fixed"),
+        else_="regressed",
+    ).label("change")
+    return select(pivot, change)
+
+
+async def compare_versions(base: UUID,
+                           candidate: UUID,
+                           page_params: PageParams,
+                           change: Optional[str] = None,
+                           db: AsyncSession = Depends(get_db)) -> Tuple[VersionComparison, Optional[str]]:
+    """Compare the results of two versions of the same prompt, test case by test case.
+    Returns a page of test cases (optionally only one kind of change) with the totals over all of them,
+    and the cursor of the next page."""
+    versions = {v.version_id: v for v in (await db.scalars(
+        select(PromptVersion).where(PromptVersion.version_id.in_([base, candidate]))
+    )).all()}
+    if base not in versions or candidate not in versions:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Prompt version not found")
+    if versions[base].prompt_id != versions[candidate].prompt_id:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Both versions must belong to the same prompt")
+
+    rows = _comparison(base, candidate).subquery()
+    counts = (await db.execute(select(
+        func.count().label("total"),
+        func.count().filter(rows.c.change == "fixed").label("fixed"),
+        func.count().filter(rows.c.change == "regressed").label("regressed"),
+        func.count().filter(rows.c.change == "unchanged").label("unchanged"),
+        func.count().filter(rows.c.change == "unmatched").label("unmatched"),
+    ))).one()
+
+    stmt = select(rows)
+    if change:
+        stmt = stmt.where(rows.c.change == change)
+    stmt = keyset(stmt, (rows.c.created, rows.c.test_id), page_params)
+    result, next_cursor = page((await db.execute(stmt)).all(), page_params, lambda row: (row.created, row.test_id))
+
+    return VersionComparison(
+        base_version_id=base,
+        candidate_version_id=candidate,
+        **counts._mapping,
+        cases=[TestCaseComparison.model_validate(row._mapping) for row in result],
+    ), next_cursor
@@ -1,17 +1,19 @@
 from fastapi import Depends, status, HTTPException
 from src.schemas import DisplayPrompt
 from src.db.database import get_db
-from sqlalchemy.orm import Session
-from src.db.models import Prompt, PromptVersion
-from typing import List
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.db.models import Prompt, PromptVersion, VersionResultStats
+from typing import List, Optional, Tuple
 from sqlalchemy import select
+from src.services.pagination import PageParams, keyset, page
+from src.services.version_stats import result_stats
 
 
-def display_prompt(prompt: Prompt, db: Session = Depends(get_db)) -> DisplayPrompt:
+async def display_prompt(prompt: Prompt, db: AsyncSession = Depends(get_db)) -> DisplayPrompt:
     """Retrieve full prompt details including its current version."""
     
     # Get current version of prompt
-    current_version = db.get(PromptVersion, prompt.current_version_id)
+    current_version = await db.get(PromptVersion, prompt.current_version_id)
     if not current_version:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Prompt version not found")
     
@@ -21,32 +23,45 @@ def display_prompt(prompt: Prompt, db: Session = Depends(get_db)) -> DisplayProm
         prompt_name=prompt.prompt_name,
         version_number=current_version.version_number,
         prompt_content=current_version.prompt_content,
-        status=current_version.status
+        status=current_version.status,
+        result_stats=result_stats(await db.get(VersionResultStats, current_version.version_id))
     )
     return display_data 
 
 
-def display_all_prompts(db: Session = Depends(get_db)) -> List[DisplayPrompt]:
-    """Retrieve all prompts with their current version details."""
+async def display_all_prompts(db: AsyncSession = Depends(get_db),
+                              page_params: PageParams = Depends(),
+                              status_filter: Optional[str] = None) -> Tuple[List[DisplayPrompt], Optional[str]]:
+    """Retrieve a page of prompts with their current version details, oldest first.
+    Returns the prompts and the cursor for the next page (None on the last page)."""
 
     #  Get full prompt details of latest prompt version
     stmt = (
         select(
             Prompt.prompt_id,
+            Prompt.created,
             Prompt.current_version_id,
             Prompt.prompt_name,
             PromptVersion.version_number,
             PromptVersion.prompt_content,
-            PromptVersion.status
+            PromptVersion.status,
+            VersionResultStats
         )   
         .join(
             PromptVersion,
             Prompt.current_version_id == PromptVersion.version_id
         )
+        .outerjoin(
+            VersionResultStats,
+            VersionResultStats.version_id == PromptVersion.version_id
+        )
     )
+    if status_filter:
+        stmt = stmt.where(PromptVersion.status == status_filter)
+    stmt = keyset(stmt, (Prompt.created, Prompt.prompt_id), page_params)
 
-    result = db.execute(stmt).all()
-    if not result:
+    result, next_cursor = page((await db.execute(stmt)).all(), page_params, lambda row: (row.created, row.prompt_id))
+    if not result and not page_params.after:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No prompts found")
     
     prompts = [
@@ -57,8 +72,9 @@ def display_all_prompts(db: Session = Depends(get_db)) -> List[DisplayPrompt]:
             prompt_name=row.prompt_name,
             prompt_content=row.prompt_content,
             status=row.status,
+            result_stats=result_stats(row.VersionResultStats),
         )
         for row in result
     ]
 
-    return prompts
\ No newline at end of file
+    return prompts, next_cursor
\ No newline at end of file
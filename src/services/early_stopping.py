@@ -0,0 +1,81 @@
+from fastapi import Query
+from src.config import get_settings
+from statistics import NormalDist
+from typing import Optional, Tuple
+import math
+
+TARGET_UNREACHABLE = "target_unreachable"
+TARGET_EXCEEDED = "target_exceeded"
+
+
+def wilson_interval(passed: int, evaluated: int, confidence: float) -> Tuple[float, float]:
+    """Two-sided Wilson score interval of the pass rate after `passed` passes in `evaluated` test cases."""
+    if not evaluated:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    rate = passed / evaluated
+    denominator = 1 + z * z / evaluated
+    center = (rate + z * z / (2 * evaluated)) / denominator
+    margin = z * ((rate * (1 - rate) + z * z / (4 * evaluated)) / evaluated) ** 0.5 / denominator
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+def spent_alpha(fraction: float, alpha: float) -> float:
+    """Lan-DeMets Pocock-type alpha spending: the error probability allowed once `fraction` of the
+    test cases are evaluated, all of `alpha` at the end. Spent evenly enough that a clearly bad
+    version stops early, unlike O'Brien-Fleming-type spending which saves almost all of it for the end."""
+    return alpha * math.log(1 + (math.e - 1) * min(max(fraction, 0.0), 1.0))
+
+
+def stop_reason(passed: int,
+                evaluated: int,
+                total: int,
+                target_pass_rate: float,
+                confidence: float,
+                min_cases: int) -> Optional[str]:
+    """Whether a run can stop evaluating its remaining test cases, and why.
+    Called after each evaluated test case (`evaluated` grows by one between calls).
+    1. Deterministic bounds: the target is out of reach even if every remaining test case passes,
+       or already met even if every remaining one fails
+    2. After `min_cases` test cases, the Wilson interval of the pass rate lies entirely below or above the target.
+       The rule looks at the data after every test case, so each look only gets the share of 1 - confidence
+       spent since the previous one (spent_alpha): over all looks together, the chance of stopping on the
+       wrong side of the target stays below 1 - confidence
+    Returns TARGET_UNREACHABLE, TARGET_EXCEEDED or None to keep going."""
+    if not 0 < target_pass_rate <= 1:
+        raise ValueError("target_pass_rate must be in (0, 1]")
+    if (passed + total - evaluated) < target_pass_rate * total:
+        return TARGET_UNREACHABLE
+    if passed >= target_pass_rate * total:
+        return TARGET_EXCEEDED
+    if evaluated < min_cases:
+        return None
+    alpha = 1 - confidence
+    look_alpha = spent_alpha(evaluated / total, alpha)
+    if evaluated > min_cases:
+        look_alpha -= spent_alpha((evaluated - 1) / total, alpha)
+    if look_alpha <= 0:  # nothing to spend yet at this fraction
+        return None
+    lower, upper = wilson_interval(passed, evaluated, 1 - look_alpha)
+    if upper < target_pass_rate:
+        return TARGET_UNREACHABLE
+    if lower > target_pass_rate:
+        return TARGET_EXCEEDED
+    return None
+
+
+class EarlyStopParams:
+    """Query parameters of the early-stopping rule of a batch run (disabled without target_pass_rate)."""
+    def __init__(self,
+                 target_pass_rate: Optional[float] = Query(None, gt=0, le=1, description="Stop scheduling test cases once this pass rate is clearly out of reach or clearly exceeded."),
+                 confidence: Optional[float] = Query(None, gt=0, lt=1, description="Confidence of the stopping rule over the whole run (defaults to settings.early_stop_confidence)."),
+                 min_cases: Optional[int] = Query(None, ge=1, description="Test cases evaluated before the statistical rule applies (defaults to settings.early_stop_min_cases).")):
+        settings = get_settings()
+        self.target_pass_rate = target_pass_rate
+        self.confidence = confidence or settings.early_stop_confidence
+        self.min_cases = min_cases or settings.early_stop_min_cases
+
+    def reason(self, passed: int, evaluated: int, total: int) -> Optional[str]:
+        if self.target_pass_rate is None:
+            return None
+        return stop_reason(passed, evaluated, total, self.target_pass_rate, self.confidence, self.min_cases)
@@ -0,0 +1,141 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.db.models import PromptVersion, TestCase, EvaluationRun, EvaluationJob, utcnow
+from src.db.database import get_db
+from src.config import get_settings
+from fastapi import Depends, HTTPException, status
+from sqlalchemy import and_, insert, or_, select, update
+from typing import List
+from uuid import UUID
+import datetime
+
+
+async def enqueue_run(prompt_version_id: UUID,
+                      db: AsyncSession = Depends(get_db)) -> EvaluationRun:
+    """Create an evaluation run with one queued job per test case of the version's prompt.
+    The jobs are picked up by `python -m src.worker`, so this returns as soon as they are stored."""
+    target_version = await db.get(PromptVersion, prompt_version_id)
+    if not target_version:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Prompt version not found")
+
+    test_ids = (await db.scalars(
+        select(TestCase.test_id).where(TestCase.prompt_id == target_version.prompt_id)
+    )).all()
+    if not test_ids:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No test cases found for this prompt")
+
+    run = EvaluationRun(prompt_version_id=prompt_version_id, total=len(test_ids))
+    db.add(run)
+    await db.flush()
+
+    batch_size = get_settings().bulk_insert_batch_size
+    rows = [{"run_id": run.run_id, "test_id": test_id} for test_id in test_ids]
+    for start in range(0, len(rows), batch_size):
+        await db.execute(insert(EvaluationJob), rows[start:start + batch_size])
+    await db.commit()
+    await db.refresh(run)
+    return run
+
+
+async def get_run(run_id: UUID,
+                  db: AsyncSession = Depends(get_db)) -> EvaluationRun:
+    run = await db.get(EvaluationRun, run_id)
+    if not run:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Evaluation run not found")
+    return run
+
+
+async def claim_jobs(worker_id: str,
+                     limit: int,
+                     db: AsyncSession) -> List[EvaluationJob]:
+    """Claim up to `limit` queued jobs for this worker.
+    Rows locked by another worker are skipped (FOR UPDATE SKIP LOCKED), so workers never claim the same job.
+    Jobs left running past settings.job_timeout_seconds (e.g. by a crashed worker) are claimed again,
+    or marked as errored if that was their last attempt, so that their run still completes."""
+    settings = get_settings()
+    now = utcnow()
+    stale = now - datetime.timedelta(seconds=settings.job_timeout_seconds)
+    exhausted = (await db.scalars(
+        select(EvaluationJob)
+        .where(EvaluationJob.status == "running", EvaluationJob.claimed_at < stale)
+        .where(EvaluationJob.attempts >= settings.job_max_attempts)
+        .with_for_update(skip_locked=True)
+    )).all()
+    for job in exhausted:
+        await record_job_outcome(job.job_id, job.run_id, job.claimed_by, job.attempts, db,
+                                 error=f"Worker {job.claimed_by} lost the job during its last attempt")
+
+    jobs = (await db.scalars(
+        select(EvaluationJob)
+        .where(or_(
+            EvaluationJob.status == "queued",
+            and_(EvaluationJob.status == "running", EvaluationJob.claimed_at < stale),
+        ))
+        .where(EvaluationJob.attempts < settings.job_max_attempts)
+        .order_by(EvaluationJob.created)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )).all()
+
+    for job in jobs:
+        job.status = "running"
+        job.claimed_by = worker_id
+        job.claimed_at = now
+        job.attempts += 1
+
+    if jobs:
+        await db.execute(
+            update(EvaluationRun)
+            .where(EvaluationRun.run_id.in_({job.run_id for job in jobs}))
+            .where(EvaluationRun.status == "queued")
+            .values(status="running")
+        )
+    await db.commit()
+    return jobs
+
+
+async def record_job_outcome(job_id: UUID,
+                             run_id: UUID,
+                             claimed_by: str,
+                             attempt: int,
+                             db: AsyncSession,
+                             quality: str = None,
+                             error: str = None) -> bool:
+    """Mark the job done (or failed / re-queued on error) and update the run counters.
+    Only if the job is still running the attempt `attempt` claimed by `claimed_by`: an attempt that
+    outlived settings.job_timeout_seconds may have been claimed again or marked as errored meanwhile.
+    Returns False, without writing anything, when it was; the caller must then not save its test result.
+    Does not commit: the caller commits it together with the test result."""
+    if error is not None:
+        status = "queued" if attempt < get_settings().job_max_attempts else "error"
+        values = {"status": status, "error": error}
+        counters = {"errored": EvaluationRun.errored + 1}
+    else:
+        status = "done"
+        values = {"status": status, "error": None}
+        counters = {"completed": EvaluationRun.completed + 1}
+        if quality == "pass":
+            counters["passed"] = EvaluationRun.passed + 1
+        else:
+            counters["failed"] = EvaluationRun.failed + 1
+
+    claimed = await db.execute(
+        update(EvaluationJob)
+        .where(EvaluationJob.job_id == job_id,
+               EvaluationJob.status == "running",
+               EvaluationJob.claimed_by == claimed_by,
+               EvaluationJob.attempts == attempt)
+        .values(**values)
+    )
+    if claimed.rowcount == 0:
+        return False
+    if status == "queued":
+        return True
+
+    await db.execute(update(EvaluationRun).where(EvaluationRun.run_id == run_id).values(**counters))
+    await db.execute(
+        update(EvaluationRun)
+        .where(EvaluationRun.run_id == run_id)
+        .where(EvaluationRun.completed + EvaluationRun.errored >= EvaluationRun.total)
+        .values(status="completed", finished=utcnow())
+    )
+    return True
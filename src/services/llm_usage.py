@@ -0,0 +1,59 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.schemas import LLMCallIn, LLMUsageByKind, LLMUsageSummary
+from src.db.models import LLMCall, EvaluationJob
+from src.db.database import get_db
+from fastapi import Depends
+from sqlalchemy import Select, func, insert, select
+from typing import List
+from uuid import UUID
+
+
+async def add_llm_calls(llm_calls: List[LLMCallIn],
+                        prompt_version_id: UUID,
+                        db: AsyncSession = Depends(get_db)) -> None:
+    """Add the usage of LLM calls made for a whole evaluation of a prompt version rather than for one
+    test result (the consolidated rewrites of a run). Not committed: saved with the caller's transaction."""
+    if llm_calls:
+        await db.execute(insert(LLMCall), [{**call.model_dump(), "prompt_version_id": prompt_version_id} for call in llm_calls])
+
+
+def _usage_by_kind() -> Select:
+    return select(
+        LLMCall.kind,
+        func.count().label("calls"),
+        func.coalesce(func.sum(LLMCall.prompt_tokens), 0).label("prompt_tokens"),
+        func.coalesce(func.sum(LLMCall.completion_tokens), 0).label("completion_tokens"),
+        func.coalesce(func.sum(LLMCall.cost), 0.0).label("cost"),
+        func.avg(LLMCall.latency_ms).label("avg_latency_ms"),
+        func.max(LLMCall.latency_ms).label("max_latency_ms"),
+    ).group_by(LLMCall.kind).order_by(LLMCall.kind)
+
+
+async def _summarize(stmt: Select, db: AsyncSession) -> LLMUsageSummary:
+    by_kind = [LLMUsageByKind.model_validate(row._mapping) for row in (await db.execute(stmt)).all()]
+    return LLMUsageSummary(
+        calls=sum(k.calls for k in by_kind),
+        prompt_tokens=sum(k.prompt_tokens for k in by_kind),
+        completion_tokens=sum(k.completion_tokens for k in by_kind),
+        cost=sum(k.cost for k in by_kind),
+        by_kind=by_kind,
+    )
+
+
+async def version_usage(version_id: UUID,
+                        db: AsyncSession = Depends(get_db)) -> LLMUsageSummary:
+    """LLM usage of every evaluation of a prompt version: its test results and the rewrites made from their failures."""
+    stmt = _usage_by_kind().where(LLMCall.prompt_version_id == version_id)
+    return await _summarize(stmt, db)
+
+
+async def run_usage(run_id: UUID,
+                    db: AsyncSession = Depends(get_db)) -> LLMUsageSummary:
+    """LLM usage of the test results produced by the jobs of an evaluation run.
+    Queued runs never optimize, so they have no calls outside their test results."""
+    stmt = (
+        _usage_by_kind()
+        .join(EvaluationJob, EvaluationJob.result_id == LLMCall.result_id)
+        .where(EvaluationJob.run_id == run_id)
+    )
+    return await _summarize(stmt, db)
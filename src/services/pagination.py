@@ -0,0 +1,64 @@
+from fastapi import HTTPException, Query, Response, status
+from sqlalchemy import Select, tuple_
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+import base64
+import datetime
+import json
+
+# Response header carrying the cursor for the next page (absent on the last page)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+class PageParams:
+    """Query parameters shared by all paginated list endpoints."""
+    def __init__(self,
+                 limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of items to return."),
+                 after: Optional[str] = Query(None, description=f"Cursor from the {NEXT_CURSOR_HEADER} header of the previous page.")):
+        self.limit = limit
+        self.after = after
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Encode the sort key of the last row of a page into an opaque cursor."""
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime.datetime) else str(v) for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str, columns: Sequence) -> List[Any]:
+    """Decode a cursor back into values typed like the sort columns."""
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if len(raw) != len(columns):
+            raise ValueError("cursor length does not match sort key")
+        values = []
+        for column, value in zip(columns, raw):
+            python_type = column.type.python_type
+            if python_type is datetime.datetime:
+                values.append(datetime.datetime.fromisoformat(value))
+            else:
+                values.append(python_type(value))
+        return values
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def keyset(stmt: Select, order_by: Sequence, params: PageParams) -> Select:
+    """Order `stmt` by the sort key, start after the cursor and fetch one extra row to detect a next page."""
+    if params.after:
+        stmt = stmt.where(tuple_(*order_by) > tuple_(*decode_cursor(params.after, order_by)))
+    return stmt.order_by(*order_by).limit(params.limit + 1)
+
+
+def page(rows: Sequence, params: PageParams, sort_key: Callable[[Any], Tuple]) -> Tuple[List, Optional[str]]:
+    """Split the rows fetched by `keyset` into the page and the cursor for the next page."""
+    if len(rows) <= params.limit:
+        return list(rows), None
+    rows = list(rows[:params.limit])
+    return rows, encode_cursor(sort_key(rows[-1]))
+
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]) -> None:
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
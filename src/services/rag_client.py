@@ -0,0 +1,76 @@
+from fastapi import HTTPException, Request, status
+from src.config import get_settings
+from src.services.rag_store import get_rag_store
+from src.metrics import RAG_REQUEST_SECONDS, RAG_ERRORS, RAG_STORE_LOOKUPS
+from src.timing import phase
+import httpx
+import time
+
+
+def create_rag_client() -> httpx.AsyncClient:
+    """Build the shared async HTTP client used for every RAG API call.
+    Connections are kept alive and pooled, so concurrent evaluations reuse sockets instead of reconnecting."""
+    settings = get_settings()
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=settings.rag_pool_size,
+            max_keepalive_connections=settings.rag_pool_keepalive,
+        ),
+        timeout=httpx.Timeout(
+            settings.rag_read_timeout,
+            connect=settings.rag_connect_timeout,
+        ),
+        follow_redirects=True,  # the RAG API may redirect /rag -> /rag/
+    )
+
+
+def get_rag_client(request: Request) -> httpx.AsyncClient:
+    """Dependency returning the client created in the app lifespan."""
+    return request.app.state.rag_client
+
+
+async def fetch_rag_answer(rag_client: httpx.AsyncClient, query: str) -> dict:
+    """Return the RAG API response (answer, context) for the query, depending on settings.rag_mode:
+    - live: always call the RAG API
+    - record: call the RAG API and store the response
+    - replay: serve the stored response without any network I/O
+    - refresh: serve the stored response unless it is older than rag_refresh_hours, then call and store"""
+    settings = get_settings()
+    if settings.rag_mode == "live":
+        return await _call_rag_api(rag_client, query)
+
+    store = get_rag_store()
+    if settings.rag_mode == "replay":
+        rag_data = await store.aget(query)
+        RAG_STORE_LOOKUPS.labels("miss" if rag_data is None else "hit").inc()
+        if rag_data is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No recorded RAG response for this question")
+        return rag_data
+
+    if settings.rag_mode == "refresh":
+        rag_data = await store.aget(query, max_age_seconds=settings.rag_refresh_hours * 3600)
+        RAG_STORE_LOOKUPS.labels("miss" if rag_data is None else "hit").inc()
+        if rag_data is not None:
+            return rag_data
+
+    rag_data = await _call_rag_api(rag_client, query)
+    await store.aput(query, rag_data)
+    return rag_data
+
+
+async def _call_rag_api(rag_client: httpx.AsyncClient, query: str) -> dict:
+    start = time.perf_counter()
+    try:
+        with phase("rag"):
+            rag_response = await rag_client.post(f"{get_settings().rag_api}", json={"query": query})
+    except httpx.HTTPError as e:
+        RAG_ERRORS.labels("timeout" if isinstance(e, httpx.TimeoutException) else "connection").inc()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="RAG API error, check your api url and server status")
+
+    RAG_REQUEST_SECONDS.observe(time.perf_counter() - start)
+
+    if rag_response.status_code != 200:
+        RAG_ERRORS.labels(f"http_{rag_response.status_code}").inc()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="RAG API error, check your api url and server status")
+
+    return rag_response.json()
@@ -0,0 +1,62 @@
+from src.config import get_settings
+from functools import lru_cache
+from typing import Optional
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+class RagStore:
+    """Recorded RAG API responses keyed by a hash of (RAG API url, question), stored in a local SQLite file.
+    aget / aput run the SQLite work in a worker thread, off the event loop."""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS rag_responses (
+                   key TEXT PRIMARY KEY,
+                   question TEXT NOT NULL,
+                   response TEXT NOT NULL,
+                   fetched REAL NOT NULL
+               )"""
+        )
+
+    @staticmethod
+    def make_key(rag_api: str, question: str) -> str:
+        return hashlib.sha256(f"{rag_api}\n{question.strip()}".encode("utf-8")).hexdigest()
+
+    def get(self, question: str, max_age_seconds: Optional[float] = None) -> Optional[dict]:
+        """Return the recorded response, or None if there is none (or it is older than max_age_seconds)."""
+        key = self.make_key(get_settings().rag_api, question)
+        with self._lock:
+            row = self._conn.execute("SELECT response, fetched FROM rag_responses WHERE key = ?", (key,)).fetchone()
+        if not row:
+            return None
+        if max_age_seconds is not None and time.time() - row[1] > max_age_seconds:
+            return None
+        return json.loads(row[0])
+
+    def put(self, question: str, response: dict) -> None:
+        key = self.make_key(get_settings().rag_api, question)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO rag_responses (key, question, response, fetched) VALUES (?, ?, ?, ?)",
+                (key, question, json.dumps(response), time.time()),
+            )
+
+
+    async def aget(self, question: str, max_age_seconds: Optional[float] = None) -> Optional[dict]:
+        return await asyncio.to_thread(self.get, question, max_age_seconds)
+
+    async def aput(self, question: str, response: dict) -> None:
+        await asyncio.to_thread(self.put, question, response)
+
+
+@lru_cache
+def get_rag_store() -> RagStore:
+    return RagStore(get_settings().rag_store_path)
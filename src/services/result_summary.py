@@ -0,0 +1,78 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.schemas import ResultsSummary, ScoreStats
+from src.db.models import TestResults
+from src.db.database import get_db
+from fastapi import Depends
+from sqlalchemy import func, literal_column, select
+from typing import Dict, List, Optional
+from uuid import UUID
+
+SCORE_COLUMNS = ("faithfulness", "context_relevancy", "answer_relevancy")
+PERCENTILES = {"p10": 0.1, "p50": 0.5, "p90": 0.9}
+
+
+def _percentile_cont(values: List[float], q: float) -> Optional[float]:
+    """Linear interpolation between the closest ranks, as Postgres' percentile_cont."""
+    if not values:
+        return None
+    position = q * (len(values) - 1)
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+async def version_summary(version_id: UUID,
+                          db: AsyncSession = Depends(get_db)) -> ResultsSummary:
+    """Pass rate and score distributions of the test results of a prompt version,
+    aggregated by the database in one GROUP BY query.
+    SQLite has no percentile_cont, so there the percentiles are computed from the sorted scores."""
+    with_percentiles = db.get_bind().dialect.name == "postgresql"
+    columns = [
+        func.count().label("total"),
+        func.count().filter(TestResults.result == "pass").label("passed"),
+        func.count().filter(TestResults.result == "fail").label("failed"),
+        func.count(TestResults.faithfulness).label("scored"),
+    ]
+    for name in SCORE_COLUMNS:
+        column = getattr(TestResults, name)
+        columns += [
+            func.avg(column).label(f"{name}_mean"),
+            func.min(column).label(f"{name}_min"),
+            func.max(column).label(f"{name}_max"),
+        ]
+        if with_percentiles:
+            # Inline fractions: a bound parameter would be ambiguous between the percentile_cont overloads
+            columns += [func.percentile_cont(literal_column(str(q))).within_group(column).label(f"{name}_{label}")
+                        for label, q in PERCENTILES.items()]
+    row = (await db.execute(
+        select(*columns)
+        .where(TestResults.prompt_version_id == version_id)
+        .group_by(TestResults.prompt_version_id)
+    )).one_or_none()
+
+    stats: Dict[str, Dict[str, Optional[float]]] = {
+        name: {stat: getattr(row, f"{name}_{stat}", None) if row else None
+               for stat in ("mean", "min", "max", *PERCENTILES)}
+        for name in SCORE_COLUMNS
+    }
+    if row and not with_percentiles:
+        for name in SCORE_COLUMNS:
+            column = getattr(TestResults, name)
+            values = list((await db.scalars(
+                select(column)
+                .where(TestResults.prompt_version_id == version_id, column.is_not(None))
+                .order_by(column)
+            )).all())
+            stats[name].update({label: _percentile_cont(values, q) for label, q in PERCENTILES.items()})
+
+    total = row.total if row else 0
+    passed = row.passed if row else 0
+    return ResultsSummary(
+        prompt_version_id=version_id,
+        total=total,
+        passed=passed,
+        failed=row.failed if row else 0,
+        pass_rate=passed / total if total else None,
+        scored=row.scored if row else 0,
+        **{name: ScoreStats(**stats[name]) for name in SCORE_COLUMNS},
+    )
@@ -0,0 +1,130 @@
+from fastapi import HTTPException, status
+from src.db.models import TestCase
+from src.services.rag_client import fetch_rag_answer
+from src.evaluator.usage import recording
+from src.metrics import EVALUATIONS_IN_FLIGHT
+from functools import lru_cache
+from typing import TYPE_CHECKING, AsyncIterator, List, Optional, Tuple, Union
+import asyncio
+import httpx
+import openai
+
+if TYPE_CHECKING:
+    from src.evaluator.agent import EvaluatorAgent
+    from src.services.early_stopping import EarlyStopParams
+
+# Upper bound of the concurrency parameter of the batch runs: more test cases at once than the default
+# settings.rag_pool_size would only queue for a RAG connection
+MAX_CONCURRENCY = 100
+
+
+@lru_cache
+def get_agent() -> "EvaluatorAgent":
+    """The evaluator agent of this process, built on first use (dependency of the evaluation routes).
+    LangChain and the LLM client are imported here, so processes that never evaluate do not load them."""
+    from src.evaluator.agent import EvaluatorAgent
+    return EvaluatorAgent()
+
+
+async def evaluate_test_case(prompt_content: str,
+                                   test_case: TestCase,
+                                   agent: "EvaluatorAgent",
+                                   rag_client: httpx.AsyncClient,
+                                   score_only: bool = False) -> dict:
+    """Evaluate a single test case against the given prompt content.
+    1. Call RAG API with the test case question
+    2. Pass prompt_content, query, rag_ans, correct_answer, context to the agent
+       (with score_only, only the judge runs and the prompt is not rewritten)
+    3. Return the agent response as a dictionary (quality, prompt_content, reason, scores),
+       plus the RAG answer under rag_ans and the usage of every LLM call it made under llm_calls"""
+
+    # Call RAG API
+    rag_data = await fetch_rag_answer(rag_client, test_case.question)
+
+    # Context for agent to evaluate prompt
+    rag_ans = rag_data.get("answer", "")
+    rag_context = rag_data.get("context", "")
+    correct_answer = test_case.answer
+
+    # Pass prompt_content, query, rag_ans, correct_answer, context to agent
+    try:
+        with recording() as llm_calls, EVALUATIONS_IN_FLIGHT.track_inprogress():
+            evaluate = agent.ascore if score_only else agent.aevaluate
+            agent_result = await evaluate(
+                prompt_content=prompt_content,
+                query=test_case.question,
+                rag_ans=rag_ans,
+                correct_answer=correct_answer,
+                context=rag_context
+            )
+    except openai.RateLimitError:
+        # Still rate limited after the limiter's retries
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="LLM provider rate limit reached, try again later.")
+
+    if not agent_result:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Evaluator Agent failed to provide a response.")
+
+    return {**agent_result.model_dump(), "rag_ans": rag_ans, "llm_calls": llm_calls}
+
+
+async def evaluate_test_cases(prompt_content: str,
+                                    test_cases: List[TestCase],
+                                    agent: "EvaluatorAgent",
+                                    rag_client: httpx.AsyncClient,
+                                    concurrency: int,
+                                    score_only: bool = False,
+                                    early_stop: Optional["EarlyStopParams"] = None) -> Tuple[List[Union[dict, Exception, None]], Optional[str]]:
+    """Evaluate many test cases concurrently, with at most `concurrency` evaluations in flight.
+    Results are returned in the same order as `test_cases`; a failed evaluation gets its exception
+    instead of failing the others.
+    With an early-stopping rule, no new test case is started once the rule fires: evaluations already
+    in flight still finish, the others get None. Returns the results and the reason the run stopped
+    (None if every test case was evaluated)."""
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    passed = evaluated = 0
+    reason: Optional[str] = None
+
+    async def bounded(test_case: TestCase) -> Union[dict, Exception, None]:
+        nonlocal passed, evaluated, reason
+        async with semaphore:
+            if reason:
+                return None
+            try:
+                result = await evaluate_test_case(prompt_content, test_case, agent, rag_client, score_only)
+            except Exception as e:
+                return e
+            # Counted before releasing the semaphore, so the next waiting test case sees the decision
+            evaluated += 1
+            passed += result.get("quality") == "pass"
+            if early_stop and not reason:
+                reason = early_stop.reason(passed, evaluated, len(test_cases))
+            return result
+
+    results = await asyncio.gather(*(bounded(tc) for tc in test_cases))
+    return results, reason if None in results else None
+
+
+async def iter_evaluations(prompt_content: str,
+                           test_cases: List[TestCase],
+                           agent: "EvaluatorAgent",
+                           rag_client: httpx.AsyncClient,
+                           concurrency: int) -> AsyncIterator[Tuple[TestCase, Union[dict, Exception]]]:
+    """Evaluate many test cases concurrently and yield (test_case, agent result) as each one finishes.
+    A failed evaluation yields its exception instead of stopping the others.
+    Evaluations still running are cancelled if the consumer stops iterating (e.g. the client disconnects)."""
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def bounded(test_case: TestCase) -> Tuple[TestCase, Union[dict, Exception]]:
+        async with semaphore:
+            try:
+                return test_case, await evaluate_test_case(prompt_content, test_case, agent, rag_client)
+            except Exception as e:
+                return test_case, e
+
+    tasks = [asyncio.create_task(bounded(tc)) for tc in test_cases]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
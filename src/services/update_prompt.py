@@ -1,42 +1,49 @@
 from fastapi import Depends, HTTPException, status
 from src.schemas import DisplayPrompt, EditPromptIn, DisplayVersion
 from src.db.database import get_db
-from sqlalchemy.orm import Session
-from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select, update
 from sqlalchemy.exc import IntegrityError
 from src.db.models import Prompt, PromptVersion
 from uuid import UUID
 
-# Manual Edit or LLM Generated prompt update service
-def update_prompt_version(prompt: Prompt,
-                          prompt_data: EditPromptIn,
-                          db: Session = Depends(get_db)) -> DisplayPrompt:
-    """Create a new version of the prompt with the updated prompt content.
-    1. Fetch the current prompt to get its current version number
-    2. Create a new PromptVersion with version_number incremented by 1
-    3. Update the current_version_id in the parent Prompt to point to the new version.
-    4. Commit all the changes to the database at once"""
-    
-    # Create new version
-    latest_version = db.get(PromptVersion, prompt.current_version_id)
-    if not latest_version:
+async def add_prompt_version(prompt_id: UUID,
+                             prompt_content: str,
+                             db: AsyncSession = Depends(get_db)) -> PromptVersion:
+    """Add a version of the prompt numbered after its highest version, without making it the current one.
+    Numbered from the highest rather than the current version, which may be an older one.
+    Flushed but not committed: saved with the caller's transaction."""
+    latest_number = await db.scalar(
+        select(func.max(PromptVersion.version_number)).where(PromptVersion.prompt_id == prompt_id)
+    )
+    if latest_number is None:
         raise HTTPException(status_code=404, detail="Prompt version not found")
-    new_version_number = latest_version.version_number + 1
-
 
     new_version = PromptVersion(
-        prompt_id=prompt.prompt_id,
-        prompt_content=prompt_data.prompt_content,
-        version_number=new_version_number
+        prompt_id=prompt_id,
+        prompt_content=prompt_content,
+        version_number=latest_number + 1
     )
     db.add(new_version)
-    db.flush()  # Generates new_version.version_id
+    await db.flush()  # Generates new_version.version_id
+    return new_version
+
+
+# Manual Edit or LLM Generated prompt update service
+async def update_prompt_version(prompt: Prompt,
+                                prompt_data: EditPromptIn,
+                                db: AsyncSession = Depends(get_db)) -> DisplayPrompt:
+    """Create a new version of the prompt with the updated prompt content.
+    1. Create a new PromptVersion numbered after the prompt's highest version
+    2. Update the current_version_id in the parent Prompt to point to the new version.
+    3. Commit all the changes to the database at once"""
+    new_version = await add_prompt_version(prompt.prompt_id, prompt_data.prompt_content, db)
 
     # 3. Update prompt to point to new version
     prompt.current_version_id = new_version.version_id
 
-    db.commit()  # Save all changes at once
-    db.refresh(prompt)
+    await db.commit()  # Save all changes at once
+    await db.refresh(prompt)
     return DisplayPrompt(
         prompt_id=prompt.prompt_id,
         prompt_name=prompt.prompt_name,
@@ -48,10 +55,10 @@ def update_prompt_version(prompt: Prompt,
 
 
 # Set prompt version to active service
-def set_prompt_active(version_id: UUID,
-                      db: Session = Depends(get_db)):
+async def set_prompt_active(version_id: UUID,
+                            db: AsyncSession = Depends(get_db)):
     """Set the current version of the prompt to active status."""
-    version = db.get(PromptVersion, version_id)
+    version = await db.get(PromptVersion, version_id)
 
     if not version:
         raise HTTPException(status_code=404, detail="Prompt version not found")
@@ -63,18 +70,18 @@ def set_prompt_active(version_id: UUID,
             where(PromptVersion.prompt_id == version.prompt_id).
             values(status="inactive")
         )
-        db.execute(stmt)
+        await db.execute(stmt)
 
         # Set the specific version to 'active'
         version.status = "active"
 
         # Commit the transaction
-        db.commit()
-        db.refresh(version)
+        await db.commit()
+        await db.refresh(version)
         
         return version
     except Exception:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Another prompt version is already active.")
 
 
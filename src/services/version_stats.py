@@ -0,0 +1,62 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.dialects import postgresql, sqlite
+from src.schemas import ResultStats, TestResultIn
+from src.db.models import VersionResultStats, utcnow
+from src.db.database import get_db
+from fastapi import Depends
+from typing import Dict, Optional, Sequence
+
+COUNTERS = ("total", "passed", "failed", "scored", "faithfulness_sum", "context_relevancy_sum", "answer_relevancy_sum")
+
+# INSERT ... ON CONFLICT DO UPDATE of each supported backend
+_UPSERT = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+async def add_to_version_stats(test_results: Sequence[TestResultIn],
+                               db: AsyncSession = Depends(get_db)) -> None:
+    """Add test results to the running totals of their prompt versions.
+    Does not commit: call it in the transaction that saves the results, so both are written or neither."""
+    if not test_results:
+        return
+    deltas: Dict = {}
+    for result in test_results:
+        delta = deltas.setdefault(result.prompt_version_id, dict.fromkeys(COUNTERS, 0))
+        delta["total"] += 1
+        delta["passed"] += result.result == "pass"
+        delta["failed"] += result.result == "fail"
+        if result.faithfulness is not None:
+            delta["scored"] += 1
+            delta["faithfulness_sum"] += result.faithfulness
+            delta["context_relevancy_sum"] += result.context_relevancy or 0.0
+            delta["answer_relevancy_sum"] += result.answer_relevancy or 0.0
+
+    now = utcnow()
+    stmt = _UPSERT[db.get_bind().dialect.name](VersionResultStats)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[VersionResultStats.version_id],
+        set_={
+            **{name: getattr(VersionResultStats, name) + getattr(stmt.excluded, name) for name in COUNTERS},
+            "updated": stmt.excluded.updated,
+        },
+    )
+    # Sorted so that concurrent transactions lock the version rows in the same order
+    await db.execute(stmt, [
+        {"version_id": version_id, **delta, "updated": now}
+        for version_id, delta in sorted(deltas.items(), key=lambda item: str(item[0]))
+    ])
+
+
+def result_stats(stats: Optional[VersionResultStats]) -> Optional[ResultStats]:
+    """Pass rate and mean scores from the running totals of a version (None if it has no results yet)."""
+    if stats is None:
+        return None
+    return ResultStats(
+        total=stats.total,
+        passed=stats.passed,
+        failed=stats.failed,
+        pass_rate=stats.passed / stats.total if stats.total else None,
+        scored=stats.scored,
+        mean_faithfulness=stats.faithfulness_sum / stats.scored if stats.scored else None,
+        mean_context_relevancy=stats.context_relevancy_sum / stats.scored if stats.scored else None,
+        mean_answer_relevancy=stats.answer_relevancy_sum / stats.scored if stats.scored else None,
+    )
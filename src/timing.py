@@ -0,0 +1,121 @@
+"""Per-request phase timing.
+
+Code on the hot path wraps its work in `phase(name)` (or reports a duration it already measured
+with `add(name, ms)`); TimingMiddleware collects the phases of each request and sends them in a
+Server-Timing header and a structured (JSON) log line:
+
+    Server-Timing: db;dur=4.1;desc="3 calls", rag;dur=412.0, llm_eval;dur=2210.5, total;dur=2640.2
+
+Phases of concurrent work (e.g. a batch run) are summed, so they can add up to more than the total.
+With settings.profile_sample_rate > 0, that fraction of requests is also profiled with cProfile
+and dumped to settings.profile_dir (open with `python -m pstats` or snakeviz).
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from src.config import get_settings
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from typing import Dict, Iterator, List, Optional
+import cProfile
+import json
+import logging
+import os
+import random
+import re
+import time
+
+logger = logging.getLogger("src.timing")
+
+# {phase: [total ms, count]} of the request being served; None outside a request
+_phases: ContextVar[Optional[Dict[str, List[float]]]] = ContextVar("phases", default=None)
+
+
+def add(name: str, ms: float) -> None:
+    """Add a measured duration to a phase of the current request (no-op outside a request)."""
+    phases = _phases.get()
+    if phases is None:
+        return
+    entry = phases.setdefault(name, [0.0, 0])
+    entry[0] += ms
+    entry[1] += 1
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Time the block as one occurrence of the named phase."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add(name, (time.perf_counter() - start) * 1000)
+
+
+def server_timing(phases: Dict[str, List[float]], total_ms: float) -> str:
+    entries = [
+        f'{name};dur={ms:.1f}' + (f';desc="{count} calls"' if count > 1 else "")
+        for name, (ms, count) in phases.items()
+    ]
+    entries.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(entries)
+
+
+class TimingMiddleware:
+    """Collects the phases of every HTTP request, reports them and optionally profiles sampled requests."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        phases: Dict[str, List[float]] = {}
+        token = _phases.set(phases)
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                # Phases so far; a streamed response keeps going after its headers are sent
+                total_ms = (time.perf_counter() - start) * 1000
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", server_timing(phases, total_ms).encode("latin-1"))
+                ]
+            await send(message)
+
+        profiler = None
+        sample_rate = get_settings().profile_sample_rate
+        if sample_rate > 0 and random.random() < sample_rate:
+            # cProfile sees everything the event loop runs meanwhile, including other requests
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:  # another sampled request is already being profiled
+                profiler = None
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            total_ms = (time.perf_counter() - start) * 1000
+            _phases.reset(token)
+            route = getattr(scope.get("route"), "path", scope["path"])
+            if profiler is not None:
+                profiler.disable()
+                self._dump_profile(profiler, scope["method"], route)
+            logger.info(json.dumps({
+                "event": "request_timing",
+                "method": scope["method"],
+                "route": route,
+                "path": scope["path"],
+                "status": status_code,
+                "total_ms": round(total_ms, 1),
+                "phases": {name: {"ms": round(ms, 1), "count": count} for name, (ms, count) in phases.items()},
+            }))
+
+    @staticmethod
+    def _dump_profile(profiler: cProfile.Profile, method: str, route: str) -> None:
+        settings = get_settings()
+        os.makedirs(settings.profile_dir, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{method}-{re.sub(r'[^A-Za-z0-9_-]+', '_', route).strip('_') or 'root'}-{os.getpid()}.prof"
+        profiler.dump_stats(os.path.join(settings.profile_dir, name))
@@ -1,8 +1,11 @@
-from fastapi import APIRouter, FastAPI
+from fastapi import FastAPI, HTTPException, status
 import json
-from random import choice
+import random
 import uvicorn
-from pydantic import BaseModel 
+from pydantic import BaseModel
+from typing import Optional
+import argparse
+import asyncio
 import os
 
 class RagRequest(BaseModel):
@@ -12,29 +15,63 @@ class RaqResponse(BaseModel):
     answer: str
     context: str
 
-file_path = os.path.join(os.path.dirname(__file__), '..', '..', 'uploads', 'rag_responses.json')
+file_path = os.getenv("FAKE_RAG_FILE", os.path.join(os.path.dirname(__file__), '..', '..', 'uploads', 'rag_responses.json'))
+
+# Artificial latency (mean ± uniform jitter, in ms) and RNG seed, overridable from the command line
+latency_ms = float(os.getenv("FAKE_RAG_LATENCY_MS", "0"))
+jitter_ms = float(os.getenv("FAKE_RAG_JITTER_MS", "0"))
+rng = random.Random(os.getenv("FAKE_RAG_SEED"))
+
+# Responses indexed by normalized question, reloaded only when the file changes
+_index: dict = {}
+_index_mtime: Optional[float] = None
+
+
+def normalize(question: str) -> str:
+    return " ".join(question.split()).casefold()
+
+
+def get_index() -> dict:
+    global _index, _index_mtime
+    mtime = os.path.getmtime(file_path)
+    if mtime != _index_mtime:
+        with open(file_path, "r") as file:
+            responses = json.load(file).get("responses", [])
+        _index = {normalize(resp.get("question", "")): resp for resp in responses}
+        _index_mtime = mtime
+    return _index
+
 
 app = FastAPI()
 
+@app.post("/rag", response_model=RaqResponse)
 @app.post("/rag/", response_model=RaqResponse)
 async def search_rag(query: RagRequest):
-    with open(file_path, "r") as file:
-        responses = json.load(file).get("responses", [])
-    for resp in responses:
-        if resp.get("question") == query.query:
-            select = choice(["correct", "vague", "incorrect"])
-            if select == "correct":
-                ans = resp.get("correct", "")
-            elif select == "vague":
-                ans = resp.get("vague", "")      
-            else:
-                ans = resp.get("incorrect", "")   
-            context = resp.get("context", "")
-            return RaqResponse(answer=ans, context=context)
+    if latency_ms or jitter_ms:
+        await asyncio.sleep(max(0.0, latency_ms + rng.uniform(-jitter_ms, jitter_ms)) / 1000)
+
+    resp = get_index().get(normalize(query.query))
+    if resp is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No RAG response found for this query")
+
+    select = rng.choice(["correct", "vague", "incorrect"])
+    ans = resp.get(select, "")
+    context = resp.get("context", "")
+    return RaqResponse(answer=ans, context=context)
 
 @app.get("/health")
 def health():
     return {"status": "ok"}
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="localhost", port=8001) 
+    parser = argparse.ArgumentParser(description="Stand-in RAG API serving canned responses from uploads/rag_responses.json")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency-ms", type=float, default=latency_ms, help="mean artificial latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=jitter_ms, help="uniform jitter around the mean latency")
+    parser.add_argument("--seed", type=int, default=None, help="seed for the correct/vague/incorrect choice")
+    args = parser.parse_args()
+
+    latency_ms, jitter_ms = args.latency_ms, args.jitter_ms
+    if args.seed is not None:
+        rng.seed(args.seed)
+    uvicorn.run(app, host="localhost", port=args.port)
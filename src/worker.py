@@ -0,0 +1,123 @@
+"""Background worker for queued evaluation runs.
+
+    python -m src.worker                  # process jobs until interrupted
+    python -m src.worker --concurrency 16 # evaluate more jobs at once
+
+Runs are enqueued with POST /eval/version/{prompt_version_id}/runs. Any number of workers
+can run side by side: each job is claimed by exactly one of them, and jobs of a worker that
+dies are picked up again once settings.job_timeout_seconds have passed.
+"""
+from src.db.database import get_async_sessionmaker
+from src.db.models import EvaluationJob, EvaluationRun, PromptVersion, TestCase
+from src.schemas import TestResultIn
+from src.config import get_settings
+from src.services.add_test_case import add_result
+from src.services.evaluation_runs import claim_jobs, record_job_outcome
+from src.services.run_evaluation import evaluate_test_case, get_agent
+from src.services.rag_client import create_rag_client
+from src.metrics import mark_process_dead
+from fastapi import HTTPException
+from sqlalchemy import update
+from typing import TYPE_CHECKING, Dict
+from uuid import UUID
+import argparse
+import asyncio
+import logging
+import os
+import socket
+
+if TYPE_CHECKING:
+    from src.evaluator.agent import EvaluatorAgent
+
+logger = logging.getLogger("src.worker")
+
+
+async def process_job(job_id: UUID, agent: "EvaluatorAgent", rag_client) -> None:
+    """Evaluate one claimed job and save its test result together with the job and run updates.
+    Nothing is saved if the job was claimed again or marked as errored while this attempt ran."""
+    async with get_async_sessionmaker()() as db:
+        job = await db.get(EvaluationJob, job_id)
+        # This attempt's claim, kept apart from `job`, which is reloaded after a rollback
+        run_id, test_id, claimed_by, attempt = job.run_id, job.test_id, job.claimed_by, job.attempts
+        try:
+            test_case = await db.get(TestCase, test_id)
+            run = await db.get(EvaluationRun, run_id)
+            run_version = await db.get(PromptVersion, run.prompt_version_id)
+            # Queued runs only score: a rewritten prompt for a failed case would not be stored anywhere
+            agent_json = await evaluate_test_case(run_version.prompt_content, test_case, agent, rag_client, score_only=True)
+
+            if not await record_job_outcome(job_id, run_id, claimed_by, attempt, db, quality=agent_json.get("quality")):
+                await db.rollback()
+                logger.warning("job %s was taken over during attempt %s, its result is dropped", job_id, attempt)
+                return
+            # add_result commits the job and run updates in the same transaction as the result
+            test_result = await add_result(TestResultIn(
+                test_id=test_id,
+                prompt_version_id=run_version.version_id,
+                result=agent_json.get("quality"),
+                reason=agent_json.get("reason"),
+                faithfulness=agent_json.get("faithfulness"),
+                context_relevancy=agent_json.get("context_relevancy"),
+                answer_relevancy=agent_json.get("answer_relevancy")
+            ), db, llm_calls=agent_json.get("llm_calls"))
+            await db.execute(update(EvaluationJob).where(EvaluationJob.job_id == job_id).values(result_id=test_result.result_id))
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            error = e.detail if isinstance(e, HTTPException) else repr(e)
+            logger.warning("job %s failed (attempt %s): %s", job_id, attempt, error)
+            await record_job_outcome(job_id, run_id, claimed_by, attempt, db, error=str(error))
+            await db.commit()
+
+
+async def run_worker(concurrency: int, poll_interval: float) -> None:
+    """Keep up to `concurrency` jobs in flight, claiming a new job as soon as a slot frees up."""
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    logger.info("worker %s started (concurrency %s)", worker_id, concurrency)
+    agent = get_agent()
+    rag_client = create_rag_client()
+    in_flight: Dict[asyncio.Task, UUID] = {}
+    try:
+        while True:
+            free = concurrency - len(in_flight)
+            claimed = 0
+            if free:
+                async with get_async_sessionmaker()() as db:
+                    for job in await claim_jobs(worker_id, free, db):
+                        in_flight[asyncio.create_task(process_job(job.job_id, agent, rag_client))] = job.job_id
+                        claimed += 1
+            if not in_flight:
+                await asyncio.sleep(poll_interval)
+                continue
+            # With every slot busy, wait for a job to finish; otherwise the queue is empty, so also poll it again
+            done, _ = await asyncio.wait(in_flight, timeout=None if claimed == free else poll_interval,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                job_id = in_flight.pop(task)
+                if task.exception() is not None:
+                    logger.error("job %s could not be recorded: %r", job_id, task.exception())
+    finally:
+        for task in in_flight:
+            task.cancel()
+        await asyncio.gather(*in_flight, return_exceptions=True)
+        await rag_client.aclose()
+
+
+def main() -> None:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Process queued evaluation runs.")
+    parser.add_argument("--concurrency", type=int, default=settings.worker_concurrency, help="jobs evaluated at once")
+    parser.add_argument("--poll-interval", type=float, default=settings.worker_poll_interval, help="seconds to wait when the queue is empty")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    try:
+        asyncio.run(run_worker(max(1, args.concurrency), args.poll_interval))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        mark_process_dead()
+
+
+if __name__ == "__main__":
+    main()
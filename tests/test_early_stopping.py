@@ -0,0 +1,83 @@
+from src.services.early_stopping import TARGET_EXCEEDED, TARGET_UNREACHABLE, spent_alpha, stop_reason, wilson_interval
+import pytest
+import random
+
+
+def test_wilson_interval_contains_the_observed_rate():
+    lower, upper = wilson_interval(10, 40, 0.95)
+    assert lower < 10 / 40 < upper
+    assert lower == pytest.approx(0.1419, abs=1e-4)
+    assert upper == pytest.approx(0.4019, abs=1e-4)
+
+
+def test_wilson_interval_bounds():
+    assert wilson_interval(0, 0, 0.95) == (0.0, 1.0)
+    assert wilson_interval(0, 20, 0.95)[0] == pytest.approx(0.0, abs=1e-12)
+    assert wilson_interval(20, 20, 0.95)[1] == pytest.approx(1.0)
+
+
+def test_wilson_interval_widens_with_confidence():
+    narrow = wilson_interval(30, 60, 0.9)
+    wide = wilson_interval(30, 60, 0.99)
+    assert wide[0] < narrow[0] and wide[1] > narrow[1]
+
+
+def test_spent_alpha_spends_everything_at_the_end():
+    assert spent_alpha(0.0, 0.05) == 0.0
+    assert spent_alpha(1.0, 0.05) == pytest.approx(0.05)
+    assert spent_alpha(0.25, 0.05) < spent_alpha(0.5, 0.05) < spent_alpha(1.0, 0.05)
+
+
+def test_deterministic_unreachable():
+    # 100 cases, target 0.8: after 21 failures at most 79 can pass
+    assert stop_reason(0, 21, 100, 0.8, 0.95, min_cases=1000) == TARGET_UNREACHABLE
+    assert stop_reason(0, 20, 100, 0.8, 0.95, min_cases=1000) is None
+
+
+def test_deterministic_exceeded():
+    assert stop_reason(80, 80, 100, 0.8, 0.95, min_cases=1000) == TARGET_EXCEEDED
+    assert stop_reason(79, 79, 100, 0.8, 0.95, min_cases=1000) is None
+
+
+def test_thirty_failures_in_forty_cases():
+    assert stop_reason(10, 40, 100, 0.8, 0.95, 10) == TARGET_UNREACHABLE
+    assert stop_reason(10, 40, 1000, 0.8, 0.95, 10) == TARGET_UNREACHABLE
+
+
+def test_close_to_the_target_keeps_going():
+    assert stop_reason(30, 40, 1000, 0.8, 0.95, 10) is None
+    assert stop_reason(38, 40, 1000, 0.8, 0.95, 10) is None
+
+
+def test_min_cases():
+    assert stop_reason(0, 9, 1000, 0.8, 0.95, 10) is None
+    assert stop_reason(0, 10, 1000, 0.8, 0.95, 10) == TARGET_UNREACHABLE
+
+
+def test_target_of_one_stops_at_the_first_failure():
+    assert stop_reason(5, 5, 100, 1.0, 0.95, 10) is None
+    assert stop_reason(5, 6, 100, 1.0, 0.95, 10) == TARGET_UNREACHABLE
+    assert stop_reason(100, 100, 100, 1.0, 0.95, 10) == TARGET_EXCEEDED
+
+
+@pytest.mark.parametrize("target", [0.0, -0.1, 1.1])
+def test_invalid_targets(target):
+    with pytest.raises(ValueError):
+        stop_reason(1, 1, 100, target, 0.95, 10)
+
+
+def test_wrong_stops_stay_below_one_minus_confidence():
+    """With the true pass rate exactly at the target, every statistical stop is a wrong one.
+    Looking after every test case must not push their rate above 1 - confidence."""
+    rng = random.Random(0)
+    total, target, confidence, runs = 300, 0.5, 0.9, 400
+    wrong = 0
+    for _ in range(runs):
+        passed = 0
+        for evaluated in range(1, total + 1):
+            passed += rng.random() < target
+            decided = passed + total - evaluated < target * total or passed >= target * total
+            if stop_reason(passed, evaluated, total, target, confidence, 10):
+                wrong += not decided
+                break
+    assert wrong / runs < 1 - confidence